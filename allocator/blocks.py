@@ -0,0 +1,282 @@
+from typing import List, Tuple, Iterator, Union, Iterable, Optional, Dict, Sequence
+from array import array
+import csv
+
+import numpy as np
+
+# Type alias for clarity; BlockNo is usually a number but may be any label
+dBlock = Tuple[Union[int, str], float]
+
+# Optional columns describing a block's size: Volume, and its dimensions in one unit (L, H, W)
+SIZE_COLUMNS = ('Volume', 'L', 'H', 'W')
+
+# Cells pandas would read as missing, so every loader rejects the same files
+NA_VALUES = {
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+    '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null',
+}
+
+# Largest file read by the stdlib csv fast path; past this pandas' parser pays back its import time
+FAST_PATH_MAX_BYTES = 1 << 20
+
+
+class BlockSet:
+    """Compact block store: BlockNo and Weight held as parallel int64 / float64 arrays.
+    BlockNo is an object array of the labels instead when they are not all whole numbers;
+    the solvers only ever work with row positions, so either serves.
+    Indexing with an int gives a (BlockNo, Weight) tuple, so a BlockSet can stand in
+    for a list of dBlock; slicing gives another BlockSet over the same memory.
+    Volume and (L, H, W) dimensions are carried along when the data has them."""
+
+    __slots__ = ('block_no', 'weight', 'volume', 'dims')
+
+    def __init__(self, block_no: np.ndarray, weight: np.ndarray, volume: Optional[np.ndarray] = None,
+                 dims: Optional[np.ndarray] = None) -> None:
+        if len(block_no) != len(weight):
+            raise ValueError("BlockNo and Weight arrays must have the same length")
+        if volume is not None and len(volume) != len(weight):
+            raise ValueError("Volume array must have one entry per block")
+        if dims is not None and dims.shape != (len(weight), 3):
+            raise ValueError("Dimensions must be an (L, H, W) row per block")
+        self.block_no = block_no
+        self.weight = weight
+        self.volume = volume
+        self.dims = dims
+
+    @classmethod
+    def from_blocks(cls, blocks: Iterable[dBlock]) -> 'BlockSet':
+        """Build a store from (BlockNo, Weight) pairs."""
+        if isinstance(blocks, BlockSet):
+            return blocks
+        labels = []
+        weight = array('d')
+        for b in blocks:
+            labels.append(b[0])
+            weight.append(float(b[1]))
+        return cls(block_labels(labels), np.frombuffer(weight, dtype=np.float64))
+
+    def take(self, positions: Union[np.ndarray, List[int]]) -> 'BlockSet':
+        """The blocks at `positions`, in that order, as another BlockSet."""
+        return BlockSet(self.block_no[positions], self.weight[positions],
+                        self.volume[positions] if self.volume is not None else None,
+                        self.dims[positions] if self.dims is not None else None)
+
+    def fits_within(self, dimensions: Tuple[float, float, float]) -> np.ndarray:
+        """Mask of the blocks that fit a container's internal (L, H, W) in some orientation."""
+        if self.dims is None:
+            raise ValueError("Dimension checks need the L, H and W columns")
+        if np.isnan(self.dims).any():
+            raise ValueError("Every block needs a numeric L, H and W to check dimensions")
+        # A box fits another, turned to suit, when its sorted sides are each no longer
+        return np.all(np.sort(self.dims, axis=1) <= np.sort(np.asarray(dimensions, dtype=np.float64)), axis=1)
+
+    def total_weight(self, positions: Union[np.ndarray, List[int], None] = None) -> float:
+        """Combined weight of the blocks at `positions` (all of them by default)."""
+        if positions is None:
+            return float(self.weight.sum())
+        return float(self.weight[positions].sum()) if len(positions) else 0.0
+
+    def __len__(self) -> int:
+        return len(self.weight)
+
+    def __getitem__(self, key: Union[int, slice]) -> Union[dBlock, 'BlockSet']:
+        if isinstance(key, slice):
+            return BlockSet(self.block_no[key], self.weight[key],
+                            self.volume[key] if self.volume is not None else None,
+                            self.dims[key] if self.dims is not None else None)
+        block_no = self.block_no[key]
+        return block_no.item() if isinstance(block_no, np.generic) else block_no, float(self.weight[key])
+
+    def __iter__(self) -> Iterator[dBlock]:
+        return zip(self.block_no.tolist(), self.weight.tolist())
+
+    def __repr__(self) -> str:
+        return f"BlockSet({len(self)} blocks, {self.total_weight():.2f} total weight)"
+
+    def to_list(self) -> List[dBlock]:
+        return list(self)
+
+
+# Anything the solvers accept as a block list
+Blocks = Union[BlockSet, List[dBlock]]
+
+
+def block_labels(values: Sequence) -> np.ndarray:
+    """BlockNo values as int64 when each is a whole number, given as a number or as text,
+    otherwise as an object array of the labels as given."""
+    numbers = array('q')
+    for value in values:
+        try:
+            number = value
+            if isinstance(value, str):
+                number = int(value) if value.strip().lstrip('+-').isdigit() else float(value)
+            if number != int(number):
+                raise ValueError
+            numbers.append(int(number))
+        except (TypeError, ValueError, OverflowError):
+            return np.array(values, dtype=object)
+    return np.frombuffer(numbers, dtype=np.int64)
+
+
+def _load_blocks_csv(path: str) -> Optional[BlockSet]:
+    """Read the plain BlockNo,Weight schema with the stdlib csv module.
+    Returns None when the file needs pandas (non-integer BlockNo, non-numeric weights, odd quoting)
+    or has invalid rows, which load_block_store then locates."""
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        reader = csv.reader(f)
+        header = _check_header(next(reader, None))
+        block_col = header.index('BlockNo')
+        weight_col = header.index('Weight')
+        # Optional size columns; a missing or unreadable value reads as NaN
+        size_cols = {col: header.index(col) for col in SIZE_COLUMNS if col in header}
+        sizes = {col: array('d') for col in size_cols}
+
+        block_nos = array('q')
+        weights = array('d')
+        try:
+            for row in reader:
+                if not row:
+                    continue
+                block_no = row[block_col] if block_col < len(row) else ''
+                weight = row[weight_col] if weight_col < len(row) else ''
+                if block_no in NA_VALUES or weight in NA_VALUES:
+                    return None
+                block_nos.append(int(block_no))
+                weights.append(float(weight))
+                for col, index in size_cols.items():
+                    value = row[index].strip() if index < len(row) else ''
+                    sizes[col].append(float(value) if _is_number(value) else float('nan'))
+        except (csv.Error, UnicodeDecodeError, ValueError):
+            return None
+
+    columns = {col: np.frombuffer(values, dtype=np.float64) for col, values in sizes.items()}
+    columns['BlockNo'] = np.frombuffer(block_nos, dtype=np.int64)
+    columns['Weight'] = np.frombuffer(weights, dtype=np.float64)
+    # Check for invalid values
+    if not (columns['Weight'] >= 0).all():
+        return None
+    return block_set(columns)
+
+
+def load_block_store(path: str, chunk_rows: int = 65536, max_errors: int = 10,
+                     sizes: bool = False) -> BlockSet:
+    """Stream a CSV into a BlockSet, reading only the BlockNo and Weight columns
+    (plus Volume, L, H and W where present when `sizes` is set; a size that is not a number reads as NaN).
+    Chunks are parsed with pinned weight dtypes and validated as they arrive, so memory stays at one chunk
+    plus 16 bytes per block (more when BlockNo holds labels rather than numbers, see block_labels).
+    Invalid rows are reported with their line numbers.
+    load_blocks falls back to this for any file its stdlib fast path does not take."""
+    import pandas as pd
+
+    try:
+        header = _read_header(path)
+    except (OSError, UnicodeDecodeError, ValueError) as e:
+        raise ValueError(f"Error loading CSV file: {str(e)}")
+    extra = [col for col in SIZE_COLUMNS if col in header] if sizes else []
+    columns = ['BlockNo', 'Weight'] + extra
+
+    try:
+        chunks: Dict[str, List[np.ndarray]] = {col: [] for col in columns}
+        # BlockNo and the sizes are left to pandas, so whole numbers skip the label check
+        # and a stray note in a size column does not stop the load
+        dtypes = {'Weight': np.float64}
+        for chunk in pd.read_csv(path, usecols=columns, chunksize=chunk_rows, dtype=dtypes, encoding='utf-8-sig'):
+            weight = chunk['Weight'].to_numpy()
+            if chunk['BlockNo'].isna().any() or np.isnan(weight).any() or (weight < 0).any():
+                raise _InvalidRows()
+            block_no = chunk['BlockNo']
+            chunks['BlockNo'].append(block_no.to_numpy(np.int64) if block_no.dtype == np.int64
+                                     else block_labels(block_no.tolist()))
+            chunks['Weight'].append(weight)
+            for col in extra:
+                chunks[col].append(pd.to_numeric(chunk[col], errors='coerce').to_numpy(np.float64))
+    except (_InvalidRows, ValueError) as e:
+        # Something in the file does not parse: find exactly which rows
+        errors = _find_invalid_rows(path, max_errors)
+        if not errors:
+            raise ValueError(f"Error loading CSV file: {str(e)}")
+        more = " (further rows not checked)" if len(errors) >= max_errors else ""
+        raise ValueError(f"Error loading CSV file: invalid rows: {'; '.join(errors)}{more}")
+    except (OSError, UnicodeDecodeError, pd.errors.ParserError, pd.errors.EmptyDataError) as e:
+        raise ValueError(f"Error loading CSV file: {str(e)}")
+
+    if not chunks['BlockNo']:
+        chunks = {col: [np.zeros(0, dtype=np.int64 if col == 'BlockNo' else np.float64)] for col in columns}
+    if any(part.dtype == object for part in chunks['BlockNo']):
+        # Labels in some chunk: every BlockNo is then kept as text
+        chunks['BlockNo'] = [part if part.dtype == object else part.astype(str).astype(object)
+                             for part in chunks['BlockNo']]
+    return block_set({col: np.concatenate(parts) for col, parts in chunks.items()})
+
+
+def block_set(columns: Dict[str, np.ndarray]) -> BlockSet:
+    """Build a BlockSet from loaded columns, keeping Volume and L, H, W when the data has them."""
+    volume = columns['Volume'] if 'Volume' in columns else None
+    dims = None
+    if all(col in columns for col in ('L', 'H', 'W')):
+        dims = np.column_stack([columns['L'], columns['H'], columns['W']])
+    return BlockSet(columns['BlockNo'], columns['Weight'], volume, dims)
+
+
+class _InvalidRows(Exception):
+    """A chunk failed validation; the rows are located by _find_invalid_rows."""
+
+
+def _read_header(path: str) -> List[str]:
+    """Read the header line and check the required columns are there."""
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        return _check_header(next(csv.reader(f), None))
+
+
+def _check_header(header: Optional[List[str]]) -> List[str]:
+    """Raise ValueError unless `header` names the required columns."""
+    if header is None:
+        raise ValueError("CSV file is empty")
+
+    # Verify required columns exist
+    for col in ('BlockNo', 'Weight'):
+        if col not in header:
+            raise ValueError(f"Required column '{col}' not found in CSV file")
+    return header
+
+
+def _find_invalid_rows(path: str, max_errors: int) -> List[str]:
+    """Scan the file row by row and describe the first `max_errors` invalid rows by line number."""
+    errors = []
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        block_col = header.index('BlockNo')
+        weight_col = header.index('Weight')
+        for row in reader:
+            if not row:
+                continue
+            block_no = row[block_col] if block_col < len(row) else ''
+            weight = row[weight_col] if weight_col < len(row) else ''
+            problem = _check_row(block_no.strip(), weight.strip())
+            if problem:
+                errors.append(f"line {reader.line_num}: {problem}")
+                if len(errors) >= max_errors:
+                    break
+    return errors
+
+
+def _check_row(block_no: str, weight: str) -> str:
+    """Describe what is wrong with one row's values, or return '' if it is valid."""
+    if block_no in NA_VALUES:
+        return "empty BlockNo value"
+    if weight in NA_VALUES:
+        return "empty Weight value"
+    if not _is_number(weight):
+        return f"Weight {weight!r} is not a number"
+    if not float(weight) >= 0:
+        return f"Weight {weight!r} is negative"
+    return ""
+
+
+def _is_number(value: str) -> bool:
+    try:
+        float(value)
+    except ValueError:
+        return False
+    return True
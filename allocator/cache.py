@@ -0,0 +1,168 @@
+from typing import List, Tuple, Dict, Callable, Optional
+from collections import OrderedDict
+import hashlib
+import json
+import math
+import sqlite3
+import threading
+
+import numpy as np
+
+from allocator.blocks import BlockSet, Blocks, dBlock
+from allocator.logic import Deadline, SOLVER_settings, select_best_subset, _weight_units
+from allocator.telemetry import record
+
+SubsetResult = Tuple[List[dBlock], float, bool]
+Selection = Tuple[List[int], bool]
+
+
+def fingerprint(blocks: Blocks, capacity: float, max_blocks: Optional[int] = None,
+                precision: Optional[int] = None) -> str:
+    """Canonical key for a single-container solve: the sorted weight multiset, capacity,
+    block limit and precision. Block numbers and row order do not affect it."""
+    blocks = BlockSet.from_blocks(blocks)
+    if precision is None:
+        precision = SOLVER_settings.WEIGHT_PRECISION
+    units = np.sort(_weight_units(blocks.weight, precision))
+    capacity_units = math.floor(round(capacity * 10 ** precision, 6))
+    # A limit at or above the number of blocks is no limit at all
+    limit = len(blocks) if max_blocks is None else min(max_blocks, len(blocks))
+
+    digest = hashlib.blake2b(units.tobytes(), digest_size=20)
+    digest.update(f"|{capacity_units}|{limit}|{precision}".encode())
+    return digest.hexdigest()
+
+
+class SolveCache:
+    """Memoises proven-optimal single-container solves, keyed by fingerprint().
+    A result is stored as the weights it chose, so it maps back onto any pool with the same
+    weight multiset. The most recent `max_entries` are kept in memory; with `path` set they
+    are also written to an SQLite file, so later runs and other processes can reuse them."""
+
+    def __init__(self, max_entries: Optional[int] = None, path: Optional[str] = None,
+                 solver: Optional[Callable[..., Selection]] = None) -> None:
+        self.max_entries = max_entries if max_entries is not None else SOLVER_settings.CACHE_ENTRIES
+        self.solver = solver if solver is not None else select_best_subset
+        self.hits = 0
+        self.misses = 0
+        self._entries: 'OrderedDict[str, List[int]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if path is not None:
+            self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS solves (key TEXT PRIMARY KEY, chosen TEXT NOT NULL)")
+            self._db.commit()
+
+    def get(self, key: str) -> Optional[List[int]]:
+        """Chosen weight units stored under `key`, or None."""
+        with self._lock:
+            chosen = self._entries.get(key)
+            if chosen is not None:
+                self._entries.move_to_end(key)
+                return chosen
+            if self._db is None:
+                return None
+            row = self._db.execute("SELECT chosen FROM solves WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            chosen = json.loads(row[0])
+            self._remember(key, chosen)
+            return chosen
+
+    def put(self, key: str, chosen: List[int]) -> None:
+        with self._lock:
+            self._remember(key, chosen)
+            if self._db is not None:
+                self._db.execute("INSERT OR REPLACE INTO solves (key, chosen) VALUES (?, ?)",
+                                 (key, json.dumps(chosen)))
+                self._db.commit()
+
+    def _remember(self, key: str, chosen: List[int]) -> None:
+        self._entries[key] = chosen
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def lookup(self, blocks: Blocks, capacity: float, max_blocks: int = None,
+               precision: int = None) -> Optional[List[int]]:
+        """Positions into `blocks` of a stored optimum for this solve, or None on a miss."""
+        blocks = BlockSet.from_blocks(blocks)
+        if precision is None:
+            precision = SOLVER_settings.WEIGHT_PRECISION
+        chosen = self.get(fingerprint(blocks, capacity, max_blocks, precision))
+        if chosen is None:
+            self.misses += 1
+            record(cache_hit=False)
+            return None
+
+        self.hits += 1
+        record(engine='cache', cache_hit=True)
+        # Any block of the right weight will do; take the earliest rows
+        by_weight: Dict[int, List[int]] = {}
+        for i, w in enumerate(_weight_units(blocks.weight, precision).tolist()):
+            by_weight.setdefault(w, []).append(i)
+        taken: Dict[int, int] = {}
+        positions = []
+        for w in chosen:
+            positions.append(by_weight[w][taken.get(w, 0)])
+            taken[w] = taken.get(w, 0) + 1
+        return positions
+
+    def store(self, blocks: Blocks, capacity: float, max_blocks: Optional[int], precision: Optional[int],
+              positions: List[int]) -> None:
+        """Keep a proven optimum for this solve, given as positions into `blocks`."""
+        blocks = BlockSet.from_blocks(blocks)
+        if precision is None:
+            precision = SOLVER_settings.WEIGHT_PRECISION
+        units = _weight_units(blocks.weight, precision)
+        self.put(fingerprint(blocks, capacity, max_blocks, precision), sorted(int(units[i]) for i in positions))
+
+    def select(self, blocks: Blocks, capacity: float, max_blocks: int = None,
+               time_budget: Optional[float] = None, deadline: Optional[Deadline] = None,
+               precision: int = None) -> Selection:
+        """Same contract as select_best_subset: (positions, optimal).
+        Pass it as the `solver` of assign_containers to solve every container with `solver`
+        (or pass the cache itself as `cache`, to fall back to the shared DP table instead)."""
+        if not len(blocks) or capacity <= 0:
+            return [], True
+        blocks = BlockSet.from_blocks(blocks)
+        positions = self.lookup(blocks, capacity, max_blocks, precision)
+        if positions is not None:
+            return positions, True
+
+        positions, optimal = self.solver(blocks, capacity, max_blocks, time_budget=time_budget,
+                                         deadline=deadline, precision=precision)
+        # Only exact answers are worth keeping, a timed-out one may be beaten next run
+        if optimal:
+            self.store(blocks, capacity, max_blocks, precision, positions)
+        return positions, optimal
+
+    def solve(self, blocks: Blocks, capacity: float, max_blocks: int = None,
+              time_budget: Optional[float] = None, deadline: Optional[Deadline] = None,
+              precision: int = None) -> SubsetResult:
+        """Same contract as find_best_subset_anytime: (subset, total weight, optimal)."""
+        blocks = BlockSet.from_blocks(blocks)
+        positions, optimal = self.select(blocks, capacity, max_blocks, time_budget, deadline, precision)
+        return [blocks[i] for i in positions], blocks.total_weight(positions), optimal
+
+    def clear(self) -> None:
+        """Forget everything, including the on-disk store."""
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM solves")
+                self._db.commit()
+
+    def close(self) -> None:
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __enter__(self) -> 'SolveCache':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
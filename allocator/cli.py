@@ -0,0 +1,259 @@
+from typing import List, Dict, Optional, Any, Union, Tuple
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+from allocator.blocks import BlockSet
+from allocator.cache import SolveCache
+from allocator.improve import improve_assignments
+from allocator.logic import load_blocks, assign_containers, ContainerMap
+from allocator.portfolio import SolverPortfolio, STRATEGIES
+from allocator.telemetry import Telemetry
+
+
+def find_manifests(paths: List[str]) -> List[str]:
+    """Expand the given files and directories into a sorted list of CSV paths.
+    Plans written as CSV (*.plan.csv) are skipped, so a directory can hold its own plans."""
+    manifests = []
+    for path in paths:
+        if os.path.isdir(path):
+            manifests.extend(
+                os.path.join(path, name) for name in sorted(os.listdir(path))
+                if name.lower().endswith('.csv') and not name.lower().endswith('.plan.csv')
+            )
+        else:
+            manifests.append(path)
+    return manifests
+
+
+def output_stems(manifests: List[str]) -> List[str]:
+    """File name stem of each manifest's output: its own name, or, when names repeat, its path
+    below the manifests' common directory. Raises ValueError if two manifests would still share one."""
+    stems = [os.path.splitext(os.path.basename(path))[0] for path in manifests]
+    if len(set(stems)) < len(stems):
+        root = os.path.commonpath([os.path.dirname(os.path.abspath(path)) for path in manifests])
+        stems = [os.path.splitext(os.path.relpath(os.path.abspath(path), root))[0].replace(os.sep, '__')
+                 for path in manifests]
+
+    # Compared without case, as on Windows and macOS file systems
+    seen: Dict[str, str] = {}
+    for path, stem in zip(manifests, stems):
+        if stem.lower() in seen:
+            raise ValueError(f"{seen[stem.lower()]} and {path} would both be written as '{stem}'")
+        seen[stem.lower()] = path
+    return stems
+
+
+def build_plan(path: str, blocks: BlockSet, assignments: ContainerMap, capacity: Union[float, List[float]],
+               count: int, max_blocks: Optional[int]) -> Dict[str, Any]:
+    """Machine-readable plan for one manifest. `capacity` may list one limit per container."""
+    total_capacity = sum(capacity) if isinstance(capacity, list) else capacity * count
+    unassigned = np.ones(len(blocks), dtype=bool)
+    for info in assignments.values():
+        unassigned[info['rows']] = False
+    total_weight = sum(info['total_weight'] for info in assignments.values())
+    return {
+        'source': path,
+        'capacity': capacity,
+        'count': count,
+        'max_blocks': max_blocks,
+        'containers': [
+            {
+                'container': cid,
+                'blocks': info['blocks'],
+                'total_weight': round(info['total_weight'], 6),
+                'optimal': info['optimal'],
+                **({'total_volume': round(info['total_volume'], 6)} if 'total_volume' in info else {}),
+            }
+            for cid, info in assignments.items()
+        ],
+        'total_weight': round(total_weight, 6),
+        'fill_ratio': round(total_weight / total_capacity, 6),
+        'unassigned': blocks.block_no[unassigned].tolist(),
+    }
+
+
+def plan_manifest(path: str, capacity: Union[float, List[float]], count: int, max_blocks: Optional[int], strategy: str,
+                  time_budget: Optional[float], precision: Optional[int],
+                  cache_path: Optional[str] = None, volume: Optional[float] = None,
+                  dimensions: Optional[Tuple[float, float, float]] = None,
+                  improve: bool = False, telemetry: bool = False, solver: str = 'auto') -> Dict[str, Any]:
+    """Worker entry point: load and allocate one manifest. Errors are reported, not raised.
+    With `telemetry` the plan also carries what each container's solve did, and with
+    `solver='portfolio'` each container is solved by a SolverPortfolio."""
+    started = time.perf_counter()
+    improver = improve_assignments if improve else None
+    collector = Telemetry() if telemetry else None
+    try:
+        blocks = load_blocks(path)
+        with ExitStack() as stack:
+            solve = None
+            if solver == 'portfolio':
+                if volume is not None:
+                    raise ValueError("The portfolio only takes weight limits, not a volume")
+                solve = stack.enter_context(SolverPortfolio()).select
+            elif solver != 'auto':
+                raise ValueError(f"Unknown solver '{solver}'")
+            cache = stack.enter_context(SolveCache(path=cache_path)) if cache_path is not None else None
+            assignments = assign_containers(blocks, capacity, count, max_blocks, time_budget=time_budget,
+                                            strategy=strategy, solver=solve, precision=precision, volume=volume,
+                                            dimensions=dimensions, improver=improver, telemetry=collector,
+                                            cache=cache)
+        plan = build_plan(path, blocks, assignments, capacity, count, max_blocks)
+        plan['status'] = 'ok'
+        if collector is not None:
+            plan['telemetry'] = collector.to_dict()
+    except Exception as e:
+        plan = {'source': path, 'status': 'error', 'error': str(e)}
+    plan['elapsed'] = round(time.perf_counter() - started, 4)
+    return plan
+
+
+def write_plan(plan: Dict[str, Any], output_dir: str, fmt: str, stem: Optional[str] = None) -> str:
+    """Write one plan as JSON, or as CSV with one row per block, named after `stem`
+    (the source's file name by default). Returns the file written."""
+    if stem is None:
+        stem = os.path.splitext(os.path.basename(plan['source']))[0]
+    if fmt == 'json':
+        out_path = os.path.join(output_dir, f"{stem}.plan.json")
+        with open(out_path, 'w') as f:
+            json.dump(plan, f, indent=2)
+        return out_path
+
+    out_path = os.path.join(output_dir, f"{stem}.plan.csv")
+    with open(out_path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['Container', 'BlockNo', 'ContainerWeight'])
+        for container in plan['containers']:
+            for block_no in container['blocks']:
+                writer.writerow([container['container'], block_no, container['total_weight']])
+        for block_no in plan['unassigned']:
+            writer.writerow(['', block_no, ''])
+    return out_path
+
+
+def write_telemetry(plan: Dict[str, Any], output_dir: str, stem: Optional[str] = None) -> str:
+    """Move a plan's telemetry to its own JSON file, named like write_plan's. Returns the file written."""
+    if stem is None:
+        stem = os.path.splitext(os.path.basename(plan['source']))[0]
+    out_path = os.path.join(output_dir, f"{stem}.telemetry.json")
+    with open(out_path, 'w') as f:
+        json.dump(plan.pop('telemetry'), f, indent=2)
+    return out_path
+
+
+def run_batch(manifests: List[str], capacity: Union[float, List[float]], count: int, max_blocks: Optional[int] = None,
+              strategy: str = 'sequential', time_budget: Optional[float] = None, precision: Optional[int] = None,
+              workers: Optional[int] = None, cache_path: Optional[str] = None, volume: Optional[float] = None,
+              dimensions: Optional[Tuple[float, float, float]] = None,
+              improve: bool = False, telemetry: bool = False, solver: str = 'auto') -> List[Dict[str, Any]]:
+    """Allocate every manifest, spread across worker processes. Plans come back in input order.
+    With `cache_path` every worker shares one on-disk solve cache; `improve` adds the local-search pass.
+    A portfolio `solver` runs one process per strategy, so fewer manifests are planned at once by default."""
+    options = (max_blocks, strategy, time_budget, precision, cache_path, volume, dimensions, improve, telemetry,
+               solver)
+    if workers is None and solver == 'portfolio':
+        workers = max(1, (os.cpu_count() or 1) // len(STRATEGIES))
+    if workers == 1 or len(manifests) <= 1:
+        return [plan_manifest(path, capacity, count, *options) for path in manifests]
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(plan_manifest, path, capacity, count, *options) for path in manifests]
+        return [future.result() for future in futures]
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog='BlockAllocator',
+        description="Allocate blocks to containers for one or more CSV manifests without the GUI."
+    )
+    parser.add_argument('paths', nargs='+', help="CSV manifests, or directories containing them")
+    parser.add_argument('--capacity', type=float, nargs='+', required=True,
+                        help="Max weight per container, or one per container for a mixed fleet")
+    parser.add_argument('--count', type=int, default=None,
+                        help="Number of containers (default: one per --capacity value)")
+    parser.add_argument('--max-blocks', type=int, default=None, help="Max blocks per container (default: no limit)")
+    parser.add_argument('--volume', type=float, default=None, help="Max volume per container (needs a Volume column)")
+    parser.add_argument('--dimensions', type=float, nargs=3, default=None, metavar=('L', 'H', 'W'),
+                        help="Container internal dimensions, in the unit of the L, H and W columns")
+    parser.add_argument('--strategy', choices=['sequential', 'global'], default='sequential')
+    parser.add_argument('--solver', choices=['auto', 'portfolio'], default='auto',
+                        help="How each container is solved: 'portfolio' races several solvers on separate cores")
+    parser.add_argument('--time-budget', type=float, default=None, help="Seconds allowed per manifest")
+    parser.add_argument('--precision', type=int, default=None, help="Decimal places weights are solved to")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: one per CPU)")
+    parser.add_argument('--cache', default=None, metavar='PATH',
+                        help="SQLite file of solved containers, reused across runs (default: none)")
+    parser.add_argument('--improve', action='store_true',
+                        help="Run a local-search pass after allocating to ship more weight")
+    parser.add_argument('--telemetry', action='store_true',
+                        help="Write what each container's solve did to <name>.telemetry.json")
+    parser.add_argument('--output-dir', default='plans', help="Where plans and the summary are written")
+    parser.add_argument('--format', choices=['json', 'csv'], default='json', help="Format of the per-manifest plans")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    capacity = args.capacity[0] if len(args.capacity) == 1 else args.capacity
+    count = args.count
+    if count is None:
+        if len(args.capacity) == 1:
+            parser.error("--count is required with a single --capacity")
+        count = len(args.capacity)
+    elif len(args.capacity) > 1 and count != len(args.capacity):
+        parser.error(f"--count {count} does not match the {len(args.capacity)} capacities given")
+    if args.cache is not None and args.volume is not None:
+        parser.error("--cache cannot be combined with --volume")
+    if args.solver == 'portfolio' and args.volume is not None:
+        parser.error("--solver portfolio cannot be combined with --volume")
+
+    manifests = find_manifests(args.paths)
+    if not manifests:
+        print("No CSV manifests found", file=sys.stderr)
+        return 1
+    try:
+        stems = output_stems(manifests)
+    except ValueError as e:
+        parser.error(str(e))
+
+    started = time.perf_counter()
+    plans = run_batch(manifests, capacity, count, args.max_blocks, args.strategy, args.time_budget, args.precision,
+                      args.workers, args.cache, args.volume, tuple(args.dimensions) if args.dimensions else None,
+                      args.improve, args.telemetry, args.solver)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    summary = []
+    for plan, stem in zip(plans, stems):
+        entry = {'source': plan['source'], 'status': plan['status'], 'elapsed': plan['elapsed']}
+        if plan['status'] == 'ok':
+            if 'telemetry' in plan:
+                entry['telemetry'] = write_telemetry(plan, args.output_dir, stem)
+            entry['plan'] = write_plan(plan, args.output_dir, args.format, stem)
+            entry['containers'] = sum(1 for c in plan['containers'] if c['blocks'])
+            entry['total_weight'] = plan['total_weight']
+            entry['fill_ratio'] = plan['fill_ratio']
+            entry['unassigned'] = len(plan['unassigned'])
+            print(f"{plan['source']}: {entry['containers']} containers, {plan['total_weight']:.2f} t "
+                  f"({plan['fill_ratio']:.1%} full), {entry['unassigned']} unassigned, {plan['elapsed']:.2f} s")
+        else:
+            entry['error'] = plan['error']
+            print(f"{plan['source']}: {plan['error']}", file=sys.stderr)
+        summary.append(entry)
+
+    with open(os.path.join(args.output_dir, 'summary.json'), 'w') as f:
+        json.dump({'elapsed': round(time.perf_counter() - started, 4), 'manifests': summary}, f, indent=2)
+
+    return 0 if all(plan['status'] == 'ok' for plan in plans) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -3,8 +3,15 @@ from tkinter import filedialog, messagebox
 import tkinter.font as tkfont
 from tkinter import ttk
 from typing import Optional
-from allocator.logic import load_blocks, assign_containers
+from allocator.blocks import BlockSet
+from allocator.cache import SolveCache
+from allocator.logic import load_blocks, assign_containers, Deadline, ContainerMap
+from allocator.portfolio import SolverPortfolio
+from allocator.telemetry import Telemetry
 import os
+import queue
+import threading
+import time
 
 # Settings for selection window
 class GUI_SELECTION_settings:
@@ -16,7 +23,10 @@ class GUI_SELECTION_settings:
     CONTAINER_COUNT_TEXT: str = "Number of containers:"
     CONTAINER_PAYLOAD_TEXT: str = "Max weight per container:"
     MAX_BLOCKS_PER_CONTAINER_TEXT: str = "Max blocks per container:"
+    CONTAINER_VOLUME_TEXT: str = "Max volume per container:"  # Blank for no volume limit
+    PORTFOLIO_TEXT: str = "Race solvers on all CPU cores"  # Ignored with a volume limit
     BACKGROUND_COLOR: str = "#f5f0e1"  # Light brown/cream background
+    PROGRESS_POLL_MS: int = 100  # How often the worker's messages are picked up
 
 # Settings for results window
 class GUI_RESULTS_settings:
@@ -30,6 +40,8 @@ class GUI_RESULTS_settings:
     BLOCKS_BG: str = "#ffffff"  # White background for blocks text
     WEIGHT_COLOR: str = "#2c666e"  # Teal for weight information
     BACKGROUND_COLOR: str = "#f5f0e1"  # Light brown/cream background matching selection window
+    ROW_HEIGHT: int = 28  # Height of a row in the results tree
+    DIAGNOSTICS_TAB_TEXT: str = "Diagnostics"  # Tab with the solver telemetry of the run
 
 
 class BlockAllocatorGUI(tk.Tk):
@@ -140,21 +152,54 @@ class BlockAllocatorGUI(tk.Tk):
         # Position the dropdown
         max_blocks_dropdown.grid(row=2, column=1, sticky="w", padx=5)
 
+        # Max volume per container (needs a Volume column in the CSV)
+        ttk.Label(main_frame, text=GUI_SELECTION_settings.CONTAINER_VOLUME_TEXT).grid(row=3, column=0, sticky="e", padx=5, pady=10)
+        self.volume_var = tk.StringVar(value="")
+        volume_entry = ttk.Entry(main_frame, textvariable=self.volume_var, width=10, font=entry_font)
+        volume_entry.grid(row=3, column=1, sticky="w", padx=5)
+
+        # Solve each container with a portfolio of strategies on separate processes
+        self.portfolio_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(main_frame, text=GUI_SELECTION_settings.PORTFOLIO_TEXT,
+                        variable=self.portfolio_var).grid(row=4, column=0, columnspan=2, pady=5)
+
         # File selection
         self.csv_path: Optional[str] = None
-        ttk.Button(main_frame, text="Select CSV File...", command=self.browse_csv, width=20).grid(row=3, column=0, columnspan=2, pady=10)
+        ttk.Button(main_frame, text="Select CSV File...", command=self.browse_csv, width=20).grid(row=5, column=0, columnspan=2, pady=10)
         self.file_label = ttk.Label(main_frame, text="No file selected", wraplength=300)
-        self.file_label.grid(row=4, column=0, columnspan=2)
+        self.file_label.grid(row=6, column=0, columnspan=2)
 
         ttk.Label(
             main_frame,
             text="Make sure your CSV has columns named 'BlockNo' and 'Weight'",
             wraplength=400,
             foreground="blue",
-        ).grid(row=5, column=0, columnspan=2, pady=(0, 15))
+        ).grid(row=7, column=0, columnspan=2, pady=(0, 15))
 
         # Run button
-        ttk.Button(main_frame, text="Run allocation", command=self.run_allocation, width=20).grid(row=6, column=0, columnspan=2, pady=20)
+        self.run_button = ttk.Button(main_frame, text="Run allocation", command=self.run_allocation, width=20)
+        self.run_button.grid(row=8, column=0, columnspan=2, pady=20)
+
+        # Progress of a running allocation, hidden until one starts
+        self.progress_frame = ttk.Frame(main_frame)
+        self.progress_frame.grid(row=9, column=0, columnspan=2, sticky="ew")
+        self.progress_bar = ttk.Progressbar(self.progress_frame, orient=tk.HORIZONTAL, mode="determinate")
+        self.progress_bar.pack(fill="x", padx=5, pady=(0, 5))
+        self.progress_label = ttk.Label(self.progress_frame, text="", anchor="center")
+        self.progress_label.pack(fill="x")
+        ttk.Button(self.progress_frame, text="Cancel", command=self.cancel_allocation, width=20).pack(pady=10)
+        self.progress_frame.grid_remove()
+
+        # State of the background allocation
+        self._worker: Optional[threading.Thread] = None
+        self._worker_queue: "queue.Queue[tuple]" = queue.Queue()
+        self._deadline: Optional[Deadline] = None
+        self._started_at = 0.0
+        self._progress = (0, 0)
+        # Solves are remembered between runs, so rerunning with other settings is quick
+        self._solve_cache = SolveCache()
+        # Started on first use and kept, so later runs find its worker processes warm
+        self._portfolio: Optional[SolverPortfolio] = None
 
         for col in range(2):
             main_frame.columnconfigure(col, weight=1)
@@ -172,6 +217,11 @@ class BlockAllocatorGUI(tk.Tk):
         # Call after all widgets are created and sized
         self.after(100, _prevent_scroll_above_top)
 
+    def destroy(self) -> None:
+        if self._portfolio is not None:
+            self._portfolio.close()
+        super().destroy()
+
     def browse_csv(self) -> None:
         path = filedialog.askopenfilename(filetypes=[("CSV files", "*.csv")], title="Select block data CSV")
         if path:
@@ -181,6 +231,8 @@ class BlockAllocatorGUI(tk.Tk):
             self.file_label.config(text=filename)
 
     def run_allocation(self) -> None:
+        if self._worker is not None:
+            return
         if not self.csv_path:
             messagebox.showerror("Error", "Please select a CSV file before running.")
             return
@@ -194,14 +246,102 @@ class BlockAllocatorGUI(tk.Tk):
             max_blocks = None  # None means no limit
             if max_blocks_str != "No limit":
                 max_blocks = int(max_blocks_str)
-                
-            blocks = load_blocks(self.csv_path)
-            assignments = assign_containers(blocks, capacity, count, max_blocks)
+
+            # Blank volume means no volume limit
+            volume_str = self.volume_var.get().strip()
+            volume = float(volume_str) if volume_str else None
+            portfolio = self.portfolio_var.get()
         except Exception as e:
             messagebox.showerror("Error", f"Failed to process data: {e}")
             return
 
-        # Display results in new window
+        # Solve on a worker thread so the window stays responsive
+        self._deadline = Deadline()
+        self._started_at = time.monotonic()
+        self._progress = (0, max(count, 1))
+        self.progress_bar.configure(maximum=max(count, 1), value=0)
+        self.progress_label.config(text="Loading blocks...")
+        self.progress_frame.grid()
+        self.run_button.state(["disabled"])
+
+        self._worker = threading.Thread(
+            target=self._allocate_in_background,
+            args=(self.csv_path, capacity, count, max_blocks, volume, portfolio, self._deadline),
+            daemon=True
+        )
+        self._worker.start()
+        self.after(GUI_SELECTION_settings.PROGRESS_POLL_MS, self._poll_allocation)
+
+    def cancel_allocation(self) -> None:
+        if self._deadline is not None:
+            self._deadline.cancel()
+            self.progress_label.config(text="Cancelling...")
+
+    def _allocate_in_background(self, path: str, capacity: float, count: int, max_blocks: Optional[int],
+                                volume: Optional[float], portfolio: bool, deadline: Deadline) -> None:
+        """Worker thread: never touches Tk, only posts messages to the queue."""
+        try:
+            blocks = load_blocks(path)
+            # Cached solves and the portfolio only know about weight, so volume-limited runs solve afresh.
+            # Otherwise the cache answers first and misses go to the shared table (or the portfolio)
+            solver = None
+            cache = None
+            if volume is None:
+                cache = self._solve_cache
+                if portfolio:
+                    if self._portfolio is None:
+                        self._portfolio = SolverPortfolio()
+                    solver = self._portfolio.select
+            telemetry = Telemetry()
+            assignments = assign_containers(
+                blocks, capacity, count, max_blocks, deadline=deadline, solver=solver, cache=cache, volume=volume,
+                progress=lambda done, total: self._worker_queue.put(("progress", done, total)),
+                telemetry=telemetry
+            )
+            self._worker_queue.put(("done", assignments, blocks, telemetry))
+        except Exception as e:
+            self._worker_queue.put(("error", e))
+
+    def _poll_allocation(self) -> None:
+        finished = None
+        while True:
+            try:
+                message = self._worker_queue.get_nowait()
+            except queue.Empty:
+                break
+            if message[0] == "progress":
+                self._progress = (message[1], message[2])
+            else:
+                finished = message
+
+        done, total = self._progress
+        elapsed = time.monotonic() - self._started_at
+        self.progress_bar.configure(maximum=total, value=done)
+        if not self._deadline.cancelled():
+            self.progress_label.config(text=f"Containers {done}/{total} - {elapsed:.1f} s")
+
+        if finished is None:
+            self.after(GUI_SELECTION_settings.PROGRESS_POLL_MS, self._poll_allocation)
+            return
+
+        cancelled = self._deadline.cancelled()
+        self._worker = None
+        self._deadline = None
+        self.progress_frame.grid_remove()
+        self.run_button.state(["!disabled"])
+
+        if cancelled:
+            messagebox.showinfo("Cancelled", "The allocation was cancelled.")
+        elif finished[0] == "error":
+            messagebox.showerror("Error", f"Failed to process data: {finished[1]}")
+        else:
+            self.show_results(finished[1], finished[2], finished[3])
+
+    def show_results(self, assignments: ContainerMap, blocks: Optional[BlockSet] = None,
+                     telemetry: Optional[Telemetry] = None) -> None:
+        """Show the plan in a tree view: one row per container, blocks listed when it is expanded.
+        Block rows are only created when a container is opened, so large plans open instantly.
+        With `telemetry` a second tab shows how each container was solved."""
         result_win = tk.Toplevel(self)
         result_win.title(GUI_RESULTS_settings.WINDOW_TITLE)
         result_win.geometry(GUI_RESULTS_settings.WINDOW_GEOMETRY)
@@ -216,159 +356,124 @@ class BlockAllocatorGUI(tk.Tk):
         style.configure('.', font=(GUI_RESULTS_settings.FONT_FAMILY, GUI_RESULTS_settings.FONT_SIZE), padding=4)
         style.configure('TFrame', background=GUI_RESULTS_settings.BACKGROUND_COLOR)
         style.configure('TLabel', background=GUI_RESULTS_settings.BACKGROUND_COLOR)
-        
-        # Create a canvas with scrollbar for scrolling through containers
+        style.configure(
+            'Results.Treeview',
+            font=(GUI_RESULTS_settings.FONT_FAMILY, GUI_RESULTS_settings.FONT_SIZE - 1),
+            background=GUI_RESULTS_settings.BLOCKS_BG,
+            fieldbackground=GUI_RESULTS_settings.BLOCKS_BG,
+            rowheight=GUI_RESULTS_settings.ROW_HEIGHT
+        )
+        style.configure(
+            'Results.Treeview.Heading',
+            font=(GUI_RESULTS_settings.FONT_FAMILY, GUI_RESULTS_settings.FONT_SIZE - 1, "bold"),
+            foreground=GUI_RESULTS_settings.HEADER_COLOR
+        )
+
         outer_frame = ttk.Frame(result_win)
         outer_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
-        
-        # Add a canvas (for scrolling)
-        canvas = tk.Canvas(outer_frame, highlightthickness=0, background=GUI_RESULTS_settings.BACKGROUND_COLOR)
-        canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        
-        # Add a scrollbar
-        scrollbar = ttk.Scrollbar(outer_frame, orient=tk.VERTICAL, command=canvas.yview)
+
+        # Summary of the whole plan
+        total_weight = sum(info['total_weight'] for info in assignments.values())
+        total_blocks = sum(len(info['blocks']) for info in assignments.values())
+        ttk.Label(
+            outer_frame,
+            text=f"{len(assignments)} containers, {total_blocks} blocks, {total_weight:.2f} total weight",
+            anchor="w",
+            font=(GUI_RESULTS_settings.FONT_FAMILY, GUI_RESULTS_settings.FONT_SIZE, "bold"),
+            foreground=GUI_RESULTS_settings.WEIGHT_COLOR
+        ).pack(fill="x", pady=(0, 5))
+
+        if telemetry is not None:
+            notebook = ttk.Notebook(outer_frame)
+            notebook.pack(fill=tk.BOTH, expand=True)
+            tree_frame = ttk.Frame(notebook)
+            notebook.add(tree_frame, text=GUI_RESULTS_settings.WINDOW_TITLE)
+            notebook.add(self._diagnostics_panel(notebook, telemetry),
+                         text=GUI_RESULTS_settings.DIAGNOSTICS_TAB_TEXT)
+        else:
+            tree_frame = ttk.Frame(outer_frame)
+            tree_frame.pack(fill=tk.BOTH, expand=True)
+        tree = ttk.Treeview(tree_frame, columns=("blocks", "weight"), style='Results.Treeview')
+        tree.heading("#0", text="Container / Block", anchor="w")
+        tree.heading("blocks", text="Blocks", anchor="e")
+        tree.heading("weight", text="Total Weight", anchor="e")
+        tree.column("#0", width=240, stretch=True)
+        tree.column("blocks", width=100, anchor="e", stretch=False)
+        tree.column("weight", width=140, anchor="e", stretch=False)
+        tree.tag_configure("container", background=GUI_RESULTS_settings.CONTAINER_BG)
+
+        scrollbar = ttk.Scrollbar(tree_frame, orient=tk.VERTICAL, command=tree.yview)
+        tree.configure(yscrollcommand=scrollbar.set)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-        
-        # Configure the canvas
-        canvas.configure(yscrollcommand=scrollbar.set)
-        canvas.bind('<Configure>', lambda e: canvas.configure(scrollregion=canvas.bbox("all")))
-        
-        # Helper function for mousewheel scrolling - create a reusable function
-        def bind_mousewheel_to_canvas(canvas_widget, root_widget):
-            def _on_mousewheel(event):
-                if event.num == 5 or event.delta < 0:  # Scroll down
-                    canvas_widget.yview_scroll(1, "units")
-                elif event.num == 4 or event.delta > 0:  # Scroll up
-                    canvas_widget.yview_scroll(-1, "units")
-            
-            # Bind mousewheel for different platforms
-            if root_widget.tk.call('tk', 'windowingsystem') == 'win32':
-                # Windows binding
-                canvas_widget.bind_all("<MouseWheel>", lambda event: canvas_widget.yview_scroll(int(-1*(event.delta/120)), "units"))
-            else:
-                # Linux binding
-                canvas_widget.bind_all("<Button-4>", _on_mousewheel)
-                canvas_widget.bind_all("<Button-5>", _on_mousewheel)
-                # macOS binding with Shift+MouseWheel if using X11
-                canvas_widget.bind_all("<Shift-MouseWheel>", _on_mousewheel)
-        
-        # Bind mousewheel for this canvas
-        bind_mousewheel_to_canvas(canvas, result_win)
-        
-        # Create the frame that will contain all the containers
-        result_frame = ttk.Frame(canvas)
-        
-        # Add the frame to the canvas
-        canvas_window = canvas.create_window((0, 0), window=result_frame, anchor="nw")
-        
-        # Make sure the frame expands to the canvas width
-        def configure_frame_width(event):
-            canvas.itemconfig(canvas_window, width=event.width)
-        canvas.bind('<Configure>', lambda event: [canvas.configure(scrollregion=canvas.bbox("all")), 
-                                                 configure_frame_width(event)])
+        tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
 
-        cols = 2
-        max_rows = (len(assignments) + cols - 1) // cols  # Calculate number of rows needed
-        
-        for row in range(max_rows):
-            result_frame.rowconfigure(row, weight=1)
-            
-        for col in range(cols):
-            result_frame.columnconfigure(col, weight=1)
-            
-        for idx, (cid, info) in enumerate(assignments.items()):
-            row, col = divmod(idx, cols)
-            blocks_list = info['blocks']
-            
-            total_wt = info['total_weight']
-            
-            # Create a frame for this container with improved styling
-            container_frame = ttk.Frame(result_frame, relief=tk.RIDGE, padding=10)
-            container_frame.grid(row=row, column=col, sticky="nsew", padx=8, pady=8)
-            
-            # Styled header with container number
-            header = ttk.Label(
-                container_frame, 
-                text=f"Container {cid}", 
-                anchor="w",
-                font=(GUI_RESULTS_settings.FONT_FAMILY, GUI_RESULTS_settings.FONT_SIZE, "bold"),
-                foreground=GUI_RESULTS_settings.HEADER_COLOR
-            )
-            header.pack(fill="x", pady=(0, 5))
-            
-            # Separator for visual distinction
-            ttk.Separator(container_frame, orient="horizontal").pack(fill="x", pady=3)
-            
-            # Create a frame for the blocks with border and padding
-            blocks_frame = ttk.Frame(container_frame, padding=(5, 5))
-            blocks_frame.pack(fill="both", expand=True, pady=5)
-            
-            # Blocks title
-            ttk.Label(
-                blocks_frame,
-                text="Blocks:",
-                anchor="w",
-                font=(GUI_RESULTS_settings.FONT_FAMILY, GUI_RESULTS_settings.FONT_SIZE - 1, "italic")
-            ).pack(fill="x", anchor="w")
-            
-            # Create a bordered frame for the text widget
-            text_container = ttk.Frame(blocks_frame, relief=tk.GROOVE, borderwidth=1)
-            text_container.pack(fill="both", expand=True, pady=3)
-            
-            # Use Text widget with improved styling for block numbers
-            blocks_text = tk.Text(
-                text_container, 
-                height=5, 
-                width=30, 
-                wrap="word",
-                font=(GUI_RESULTS_settings.FONT_FAMILY, GUI_RESULTS_settings.FONT_SIZE - 1),
-                background=GUI_RESULTS_settings.BLOCKS_BG,
-                relief=tk.FLAT,
-                padx=5,
-                pady=5
+        # Only the container rows exist up front; each gets a placeholder child so it can be expanded
+        for cid, info in assignments.items():
+            node = tree.insert(
+                "", "end", iid=f"c{cid}", text=f"Container {cid}",
+                values=(len(info['blocks']), f"{info['total_weight']:.2f}"), tags=("container",)
             )
-            
-            # Format block numbers more attractively
-            if len(blocks_list) > 0:
-                formatted_blocks = ""
-                for i, block_no in enumerate(blocks_list):
-                    formatted_blocks += f"{block_no}"
-                    # Add commas between blocks except for the last one in a row
-                    if i < len(blocks_list) - 1:
-                        formatted_blocks += ", "
-                    # Add line break after every 4 blocks
-                    if (i + 1) % 4 == 0 and i < len(blocks_list) - 1:
-                        formatted_blocks += "\n"
-                blocks_text.insert("1.0", formatted_blocks)
-            else:
-                blocks_text.insert("1.0", "No blocks")
-                
-            blocks_text.config(state="disabled")  # Make it read-only
-            blocks_text.pack(fill="both", expand=True)
-            
-            # Separator before weight
-            ttk.Separator(container_frame, orient="horizontal").pack(fill="x", pady=3)
-            
-            # Weight information with distinct styling
-            weight_frame = ttk.Frame(container_frame)
-            weight_frame.pack(fill="x", pady=(5, 0))
-            
-            ttk.Label(
-                weight_frame, 
-                text=f"Total Weight:", 
-                anchor="w",
-                font=(GUI_RESULTS_settings.FONT_FAMILY, GUI_RESULTS_settings.FONT_SIZE - 1)
-            ).pack(side=tk.LEFT)
-            
-            ttk.Label(
-                weight_frame, 
-                text=f"{total_wt:.2f}", 
-                anchor="e",
-                font=(GUI_RESULTS_settings.FONT_FAMILY, GUI_RESULTS_settings.FONT_SIZE - 1, "bold"),
-                foreground=GUI_RESULTS_settings.WEIGHT_COLOR
-            ).pack(side=tk.RIGHT, padx=(5, 0))
-            
-            result_frame.columnconfigure(col, weight=1)
+            if info['blocks']:
+                tree.insert(node, "end", iid=f"c{cid}-pending", text="")
+
+        def _populate(event=None):
+            node = tree.focus()
+            pending = f"{node}-pending"
+            if not node.startswith("c") or not tree.exists(pending):
+                return
+            tree.delete(pending)
+            info = assignments[int(node[1:])]
+            rows = info.get('rows')
+            for i, block_no in enumerate(info['blocks']):
+                weight = f"{blocks[rows[i]][1]:.2f}" if blocks is not None and rows is not None else ""
+                tree.insert(node, "end", text=f"Block {block_no}", values=("", weight))
+
+        tree.bind("<<TreeviewOpen>>", _populate)
+
+    def _diagnostics_panel(self, parent: tk.Widget, telemetry: Telemetry) -> ttk.Frame:
+        """Telemetry of a run: a summary line, one row per container and a JSON export button."""
+        frame = ttk.Frame(parent)
+        run = telemetry.allocation
+        summary = f"{run.get('strategy', '')} allocation of {run.get('blocks', 0)} blocks in {run.get('time', 0):.2f} s"
+        if 'shared_table' in run:
+            summary += f", shared table {run['shared_table']}"
+        if run.get('budget_expired'):
+            summary += ", time budget ran out"
+        if 'improve_gain' in run:
+            summary += f", improvement +{run['improve_gain']:.2f}"
+        ttk.Label(frame, text=summary, anchor="w", wraplength=540).pack(fill="x", pady=(0, 5))
+
+        columns = ("engine", "time", "optimal", "fill", "cells")
+        table_frame = ttk.Frame(frame)
+        table_frame.pack(fill=tk.BOTH, expand=True)
+        table = ttk.Treeview(table_frame, columns=columns, style='Results.Treeview')
+        table.heading("#0", text="Container", anchor="w")
+        for column, heading in zip(columns, ("Engine", "Time (s)", "Optimal", "Fill", "DP cells")):
+            table.heading(column, text=heading, anchor="e")
+            table.column(column, width=90, anchor="e", stretch=False)
+        table.column("#0", width=100, stretch=True)
+        scrollbar = ttk.Scrollbar(table_frame, orient=tk.VERTICAL, command=table.yview)
+        table.configure(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        table.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
+        for cid, info in sorted(telemetry.containers.items()):
+            engine = info.get('engine', '')
+            if info.get('timed_out'):
+                engine += " (timed out)"
+            table.insert("", "end", text=f"Container {cid}", values=(
+                engine, f"{info.get('time', 0):.3f}", "yes" if info.get('optimal') else "no",
+                f"{info.get('fill', 0):.1%}", f"{info['dp_cells']:,}" if 'dp_cells' in info else ""
+            ))
+
+        def _export():
+            path = filedialog.asksaveasfilename(defaultextension=".json", filetypes=[("JSON files", "*.json")],
+                                                title="Export diagnostics")
+            if path:
+                telemetry.to_json(path)
+
+        ttk.Button(frame, text="Export JSON", command=_export).pack(anchor="e", pady=(5, 0))
+        return frame
 
 if __name__ == '__main__':
     app = BlockAllocatorGUI()
@@ -0,0 +1,229 @@
+from typing import List, Tuple, Dict, Optional, Sequence, Union
+import bisect
+
+import numpy as np
+
+from allocator.blocks import BlockSet, Blocks
+from allocator.logic import ContainerMap, Deadline, SOLVER_settings, _scale_weights
+from allocator.telemetry import tally
+
+
+class _Improver:
+    """Exchange moves between containers and the unassigned pool, with running bookkeeping.
+    Loads, block counts and volumes are kept per container and the pool is a weight-sorted list,
+    so a move is priced and applied without recomputing any container."""
+
+    def __init__(self, scaled: List[int], volumes: Optional[List[float]], members: Dict[int, List[int]],
+                 capacities: Dict[int, int], max_blocks: Optional[int], volume: Optional[float],
+                 pool: List[int], deadline: Deadline) -> None:
+        self.scaled = scaled
+        self.volumes = volumes
+        self.members = members
+        self.capacities = capacities
+        self.max_blocks = max_blocks
+        self.volume = volume
+        self.deadline = deadline
+        self.loads = {cid: sum(scaled[i] for i in rows) for cid, rows in members.items()}
+        self.fills = {cid: sum(volumes[i] for i in rows) if volumes is not None else 0.0
+                      for cid, rows in members.items()}
+        pool = sorted(pool, key=lambda i: scaled[i])
+        self.pool_weights = [scaled[i] for i in pool]
+        self.pool_rows = pool
+        self.changed = set()
+
+    # Bookkeeping
+
+    def _room(self, cid: int) -> Tuple[int, float, int]:
+        """Weight, volume and block count a container can still take."""
+        volume_room = self.volume - self.fills[cid] if self.volume is not None else float('inf')
+        block_room = self.max_blocks - len(self.members[cid]) if self.max_blocks is not None else len(self.scaled)
+        return self.capacities[cid] - self.loads[cid], volume_room, block_room
+
+    def _volume(self, rows: Sequence[int]) -> float:
+        return sum(self.volumes[i] for i in rows) if self.volumes is not None else 0.0
+
+    def _heaviest(self, room: int, volume_room: float, skip: int = -1) -> int:
+        """Pool index of the heaviest block within both rooms, or -1."""
+        idx = bisect.bisect_right(self.pool_weights, room) - 1
+        for _ in range(SOLVER_settings.IMPROVE_SCAN):
+            if idx < 0:
+                return -1
+            if idx != skip and (self.volumes is None or self.volumes[self.pool_rows[idx]] <= volume_room):
+                return idx
+            idx -= 1
+        return -1
+
+    def _apply(self, cid: int, out_rows: List[int], in_idx: List[int]) -> None:
+        """Swap `out_rows` of a container for the pool blocks at `in_idx`."""
+        in_rows = [self.pool_rows[idx] for idx in in_idx]
+        for idx in sorted(in_idx, reverse=True):
+            del self.pool_weights[idx]
+            del self.pool_rows[idx]
+        for row in out_rows:
+            at = bisect.bisect_right(self.pool_weights, self.scaled[row])
+            self.pool_weights.insert(at, self.scaled[row])
+            self.pool_rows.insert(at, row)
+        self._exchange(cid, out_rows, in_rows)
+        tally('improve_moves')
+
+    def _exchange(self, cid: int, out_rows: List[int], in_rows: List[int]) -> None:
+        self.members[cid] = [row for row in self.members[cid] if row not in out_rows] + in_rows
+        self.loads[cid] += sum(self.scaled[i] for i in in_rows) - sum(self.scaled[i] for i in out_rows)
+        self.fills[cid] += self._volume(in_rows) - self._volume(out_rows)
+        self.changed.add(cid)
+
+    # Moves
+
+    def _improve_with_pool(self, cid: int) -> bool:
+        """Apply the best add, 1-for-1, 2-for-1 or 1-for-2 exchange with the pool. Returns True if one helped."""
+        slack, volume_slack, block_room = self._room(cid)
+        rows = self.members[cid]
+        best_gain = 0
+        best_move: Tuple[List[int], List[int]] = ([], [])
+
+        if block_room > 0:
+            b = self._heaviest(slack, volume_slack)
+            if b >= 0 and self.pool_weights[b] > best_gain:
+                best_gain, best_move = self.pool_weights[b], ([], [b])
+
+        for x, a in enumerate(rows):
+            room = slack + self.scaled[a]
+            volume_room = volume_slack + self._volume([a])
+
+            # One container block for one pool block
+            b = self._heaviest(room, volume_room)
+            if b >= 0 and self.pool_weights[b] - self.scaled[a] > best_gain:
+                best_gain, best_move = self.pool_weights[b] - self.scaled[a], ([a], [b])
+
+            # One container block for two pool blocks, trying the heaviest few as the first
+            if block_room > 0:
+                first = self._heaviest(room, volume_room)
+                for _ in range(SOLVER_settings.IMPROVE_SCAN):
+                    if first < 0 or 2 * self.pool_weights[first] - self.scaled[a] <= best_gain:
+                        break
+                    rest = room - self.pool_weights[first]
+                    rest_volume = volume_room - self._volume([self.pool_rows[first]])
+                    second = self._heaviest(min(rest, self.pool_weights[first]), rest_volume, skip=first)
+                    if second >= 0:
+                        gain = self.pool_weights[first] + self.pool_weights[second] - self.scaled[a]
+                        if gain > best_gain:
+                            best_gain, best_move = gain, ([a], [first, second])
+                    first = self._heaviest(self.pool_weights[first] - 1, volume_room) if first > 0 else -1
+
+            # Two container blocks for one pool block
+            for a2 in rows[x + 1:]:
+                pair = self.scaled[a] + self.scaled[a2]
+                b = self._heaviest(slack + pair, volume_room + self._volume([a2]))
+                if b >= 0 and self.pool_weights[b] - pair > best_gain:
+                    best_gain, best_move = self.pool_weights[b] - pair, ([a, a2], [b])
+
+        if best_gain <= 0:
+            return False
+        self._apply(cid, *best_move)
+        return True
+
+    def _improve_pair(self, cid: int, other: int) -> bool:
+        """Swap one block between two containers when that opens room for a pool block. Returns True if it did."""
+        slack, volume_slack, block_room = self._room(cid)
+        other_slack, other_volume_slack, other_block_room = self._room(other)
+        best_gain = 0
+        best_move = None
+        for a in self.members[cid]:
+            for b in self.members[other]:
+                shift = self.scaled[b] - self.scaled[a]
+                volume_shift = self._volume([b]) - self._volume([a])
+                if shift == 0 or shift > slack or -shift > other_slack \
+                        or volume_shift > volume_slack or -volume_shift > other_volume_slack:
+                    continue
+                # After the swap, see whether either container can now take another block
+                for target, room, volume_room, blocks_left in (
+                        (cid, slack - shift, volume_slack - volume_shift, block_room),
+                        (other, other_slack + shift, other_volume_slack + volume_shift, other_block_room)):
+                    if blocks_left <= 0:
+                        continue
+                    idx = self._heaviest(room, volume_room)
+                    if idx >= 0 and self.pool_weights[idx] > best_gain:
+                        best_gain, best_move = self.pool_weights[idx], (a, b, target, idx)
+
+        if best_move is None:
+            return False
+        a, b, target, idx = best_move
+        self._exchange(cid, [a], [b])
+        self._exchange(other, [b], [a])
+        self._apply(target, [], [idx])
+        return True
+
+    def run(self) -> None:
+        """Keep applying improving moves until none helps or the deadline expires."""
+        cids = sorted(self.members)
+        improved = True
+        while improved and self.pool_rows:
+            improved = False
+            for cid in cids:
+                while not self.deadline.expired() and self.pool_rows and self._improve_with_pool(cid):
+                    improved = True
+            for x, cid in enumerate(cids):
+                for other in cids[x + 1:]:
+                    if self.deadline.expired() or not self.pool_rows:
+                        return
+                    if self._improve_pair(cid, other):
+                        improved = True
+            if self.deadline.expired():
+                return
+
+
+def improve_assignments(blocks: Blocks, assignments: ContainerMap, capacity: Union[float, Sequence[float]],
+                        max_blocks: int = None, time_budget: Optional[float] = None,
+                        deadline: Optional[Deadline] = None, precision: int = None,
+                        volume: Optional[float] = None,
+                        dimensions: Optional[Tuple[float, float, float]] = None) -> ContainerMap:
+    """Raise the shipped weight of a finished allocation by local search, within a time budget.
+    Each container trades blocks with the unassigned pool (add, 1-for-1, 2-for-1, 1-for-2), and
+    pairs of containers swap a block when that makes room for one more from the pool.
+    Containers that change are no longer marked optimal. `capacity` may list one limit per container."""
+    blocks = BlockSet.from_blocks(blocks)
+    if not assignments:
+        return assignments
+    if time_budget is None:
+        time_budget = SOLVER_settings.IMPROVE_TIME_LIMIT
+    deadline = Deadline(time_budget, parent=deadline)
+
+    cids = sorted(assignments)
+    limits = {cid: capacity if np.isscalar(capacity) else capacity[cid - 1] for cid in cids}
+    # One scale for every container, so loads compare across them
+    scaled, _ = _scale_weights(blocks, max(limits.values()), precision)
+    scaled_limits = {limit: _scale_weights(blocks, limit, precision)[1] for limit in set(limits.values())}
+    capacities = {cid: scaled_limits[limit] for cid, limit in limits.items()}
+
+    volumes = None
+    if volume is not None:
+        if blocks.volume is None or np.isnan(blocks.volume).any():
+            raise ValueError("Every block needs a Volume to check a volume limit")
+        volumes = blocks.volume.tolist()
+
+    eligible = np.ones(len(blocks), dtype=bool)
+    if dimensions is not None:
+        eligible &= blocks.fits_within(dimensions)
+    members = {cid: list(assignments[cid]['rows']) for cid in cids}
+    for rows in members.values():
+        eligible[rows] = False
+
+    improver = _Improver(scaled, volumes, members, capacities, max_blocks, volume,
+                         np.flatnonzero(eligible).tolist(), deadline)
+    improver.run()
+
+    improved: ContainerMap = {}
+    for cid in cids:
+        if cid not in improver.changed:
+            improved[cid] = assignments[cid]
+            continue
+        rows = improver.members[cid]
+        improved[cid] = {
+            'blocks': blocks.block_no[rows].tolist(),
+            'total_weight': blocks.total_weight(rows),
+            'optimal': False,
+            'rows': rows
+        }
+        if 'total_volume' in assignments[cid]:
+            improved[cid]['total_volume'] = float(blocks.volume[rows].sum()) if rows else 0.0
+    return improved
@@ -0,0 +1,229 @@
+from typing import List, Tuple, Dict, Callable, Optional, Sequence, Union
+
+import numpy as np
+
+from allocator.blocks import BlockSet, Blocks
+from allocator.logic import (
+    ContainerMap, Deadline, SOLVER_settings, SharedDP, select_best_subset,
+    _fleet_capacities, _fleet_table, _max_fit, _scale_weights, _weight_units,
+)
+
+
+def _locate(blocks: BlockSet, previous: ContainerMap) -> Dict[int, List[int]]:
+    """Rows of the current blocks that each previous container still holds, matched by BlockNo.
+    Blocks no longer in the manifest are left out."""
+    rows_by_block: Dict[int, List[int]] = {}
+    for row, block_no in enumerate(blocks.block_no.tolist()):
+        rows_by_block.setdefault(block_no, []).append(row)
+
+    located = {}
+    for cid in sorted(previous):
+        rows = []
+        for block_no in previous[cid]['blocks']:
+            matches = rows_by_block.get(block_no)
+            if matches:
+                rows.append(matches.pop(0))
+        located[cid] = rows
+    return located
+
+
+def replan(blocks: Blocks, previous: ContainerMap, capacity: Union[float, Sequence[float]], count: int,
+           max_blocks: int = None,
+           time_budget: Optional[float] = None, deadline: Optional[Deadline] = None,
+           solver: Optional[Callable[..., Tuple[List[int], bool]]] = None,
+           precision: int = None) -> ContainerMap:
+    """Update a sequential plan after blocks, capacity or container count changed.
+    Containers whose blocks are all still present and still fit are kept as they are. A container
+    that lost a block or no longer fits keeps the best subset of its own blocks, then every
+    container is topped up from the unassigned blocks and any new containers are filled from
+    scratch, so staged blocks are only moved when they have to be.
+    As in assign_containers, `capacity` may give one limit per container."""
+    capacities = _fleet_capacities(capacity, count)
+    blocks = BlockSet.from_blocks(blocks)
+    if time_budget is None:
+        time_budget = SOLVER_settings.ALLOCATION_TIME_LIMIT
+    allocation_deadline = Deadline(time_budget, parent=deadline)
+    if solver is None:
+        solver = select_best_subset
+
+    def solve(rows: List[int], room: float, limit: Optional[int]) -> Tuple[List[int], bool]:
+        positions, optimal = solver(blocks.take(rows), room, limit, time_budget=SOLVER_settings.DP_TIME_LIMIT,
+                                    deadline=allocation_deadline, precision=precision)
+        return [rows[p] for p in positions], optimal
+
+    # Keep what still fits; containers beyond the new count give their blocks back
+    available = np.ones(len(blocks), dtype=bool)
+    kept: Dict[int, List[int]] = {}
+    unchanged: Dict[int, bool] = {}
+    for cid, rows in _locate(blocks, previous).items():
+        if cid > count:
+            continue
+        capacity = capacities[cid - 1]
+        intact = len(rows) == len(previous[cid]['blocks'])
+        fits = round(blocks.total_weight(rows), 6) <= capacity and (max_blocks is None or len(rows) <= max_blocks)
+        if not fits:
+            rows, _ = solve(rows, capacity, max_blocks)
+        kept[cid] = rows
+        unchanged[cid] = intact and fits
+        available[rows] = False
+
+    assignments: ContainerMap = {}
+    for cid, capacity in enumerate(capacities, start=1):
+        rows = kept.get(cid, [])
+        optimal = previous[cid]['optimal'] if unchanged.get(cid) else False
+
+        pool = np.flatnonzero(available).tolist()
+        room = capacity - blocks.total_weight(rows)
+        limit = max_blocks - len(rows) if max_blocks is not None else None
+        if pool and room > 0 and (limit is None or limit > 0) and not allocation_deadline.cancelled():
+            added, added_optimal = solve(pool, room, limit)
+            if cid not in kept:
+                # A new container: solved from scratch like assign_containers would
+                optimal = added_optimal
+            elif added:
+                optimal = False
+            rows = rows + added
+            available[added] = False
+
+        if cid not in kept and not rows:
+            continue
+        assignments[cid] = {
+            'blocks': blocks.block_no[rows].tolist(),
+            'total_weight': blocks.total_weight(rows),
+            'optimal': optimal,
+            'rows': rows
+        }
+
+    return assignments
+
+
+def _extend(blocks: BlockSet, new: BlockSet) -> BlockSet:
+    """`blocks` followed by `new`; sizes are kept when both have them."""
+    volume = np.concatenate((blocks.volume, new.volume)) if blocks.volume is not None and new.volume is not None \
+        else None
+    dims = np.concatenate((blocks.dims, new.dims)) if blocks.dims is not None and new.dims is not None else None
+    return BlockSet(np.concatenate((blocks.block_no, new.block_no)), np.concatenate((blocks.weight, new.weight)),
+                    volume, dims)
+
+
+class Replanner:
+    """Keeps a sequential plan together with the shared DP table over its unassigned blocks, so later
+    changes reuse the solver state. Blocks added to the manifest are folded into the table, one
+    (capacity x blocks) update each, and the containers are topped up by reading it; nothing is
+    solved again. Other changes (blocks removed, a new capacity or count) go through replan(),
+    after which the table is built once for the next change.
+    `plan` must be the plan of `blocks`, as returned by assign_containers."""
+
+    def __init__(self, blocks: Blocks, plan: ContainerMap, capacity: Union[float, Sequence[float]], count: int,
+                 max_blocks: int = None, time_budget: Optional[float] = None, precision: int = None) -> None:
+        self.capacity = capacity
+        self.count = count
+        self.max_blocks = max_blocks
+        self.time_budget = time_budget if time_budget is not None else SOLVER_settings.ALLOCATION_TIME_LIMIT
+        self.precision = precision if precision is not None else SOLVER_settings.WEIGHT_PRECISION
+        self._reset(BlockSet.from_blocks(blocks), plan)
+
+    def _reset(self, blocks: BlockSet, plan: ContainerMap, deadline: Optional[Deadline] = None) -> None:
+        self.blocks = blocks
+        self.plan = plan
+        self.available = np.ones(len(blocks), dtype=bool)
+        for info in plan.values():
+            self.available[info['rows']] = False
+        # The table divides weights by their common unit, which blocks added later must share
+        self.unit = max(1, int(np.gcd.reduce(_weight_units(blocks.weight, self.precision)))) if len(blocks) else 1
+        self.table: Optional[SharedDP] = None
+        if self.available.any():
+            self.table = _fleet_table(blocks, self.available, max(_fleet_capacities(self.capacity, self.count)),
+                                      self.max_blocks, self.precision, Deadline(self.time_budget, parent=deadline))
+
+    def update(self, blocks: Blocks, capacity: Union[float, Sequence[float], None] = None, count: int = None,
+               deadline: Optional[Deadline] = None) -> ContainerMap:
+        """Re-plan for the current blocks (and a new capacity or count if given) with replan()."""
+        if capacity is not None:
+            self.capacity = capacity
+        if count is not None:
+            self.count = count
+        blocks = BlockSet.from_blocks(blocks)
+        plan = replan(blocks, self.plan, self.capacity, self.count, self.max_blocks, self.time_budget, deadline,
+                      precision=self.precision)
+        self._reset(blocks, plan, deadline)
+        return plan
+
+    def add_blocks(self, new_blocks: Blocks, deadline: Optional[Deadline] = None) -> ContainerMap:
+        """Add blocks to the manifest and top the containers up from the grown unassigned pool.
+        Containers only ever gain blocks, so staged ones are never moved."""
+        new = BlockSet.from_blocks(new_blocks)
+        blocks = _extend(self.blocks, new)
+        units = _weight_units(new.weight, self.precision)
+        capacities = _fleet_capacities(self.capacity, self.count)
+        if self.table is None or (units % self.unit).any():
+            # No table to extend, or the new weights need a finer unit: re-plan and rebuild
+            return self.update(blocks, deadline=deadline)
+        scaled, capacity_scaled = _scale_weights(blocks, max(capacities), self.precision)
+        block_limit = self.table.best.shape[1] - 1
+        if block_limit < min(_max_fit(scaled, capacity_scaled), self.max_blocks or len(blocks)):
+            # Light new blocks let a container hold more blocks than the table has columns for
+            return self.update(blocks, deadline=deadline)
+
+        deadline = Deadline(self.time_budget, parent=deadline)
+        rows = range(len(self.blocks), len(blocks))
+        self.blocks = blocks
+        self.available = np.concatenate((self.available, np.ones(len(new), dtype=bool)))
+        if not self.table.add(list(zip(rows, (units // self.unit).tolist())), deadline):
+            self.table = None
+
+        # Capacities in table units (no weights to scale)
+        capacities_scaled = {c: _scale_weights(blocks[:0], c, self.precision)[1] // self.unit for c in set(capacities)}
+        plan: ContainerMap = {}
+        for cid, capacity in enumerate(capacities, start=1):
+            previous = self.plan.get(cid)
+            rows = list(previous['rows']) if previous is not None else []
+            optimal = previous['optimal'] if previous is not None else False
+            room = capacities_scaled[capacity] - sum(scaled[r] for r in rows)
+            limit = block_limit if self.max_blocks is None else min(block_limit, self.max_blocks - len(rows))
+            added: List[int] = []
+            if room > 0 and limit > 0 and self.available.any() and not deadline.cancelled():
+                added, added_optimal = self._select(capacity - blocks.total_weight(rows), room, limit, deadline)
+                optimal = added_optimal if previous is None else optimal and not added
+            if previous is None and not added:
+                continue
+            rows = rows + added
+            plan[cid] = {
+                'blocks': blocks.block_no[rows].tolist(),
+                'total_weight': blocks.total_weight(rows),
+                'optimal': optimal,
+                'rows': rows
+            }
+        self.plan = plan
+        return plan
+
+    def _select(self, room: float, room_scaled: int, limit: int, deadline: Deadline) -> Tuple[List[int], bool]:
+        """Rows of the best unassigned subset within the room, read from the table while it is whole."""
+        if self.table is not None:
+            rows = self.table.select(room_scaled, limit)
+            if rows and not self.table.remove(rows, Deadline(SOLVER_settings.DP_TIME_LIMIT, parent=deadline)):
+                self.table = None
+            optimal = True
+        else:
+            pool = np.flatnonzero(self.available)
+            positions, optimal = select_best_subset(self.blocks.take(pool), room, limit,
+                                                    time_budget=SOLVER_settings.DP_TIME_LIMIT, deadline=deadline,
+                                                    precision=self.precision)
+            rows = [int(pool[p]) for p in positions]
+        self.available[rows] = False
+        return rows, optimal
+
+
+def plan_changes(previous: ContainerMap, current: ContainerMap) -> Dict[int, Tuple[Optional[int], Optional[int]]]:
+    """Blocks whose container differs between two plans, as BlockNo -> (old container, new container).
+    None stands for unassigned (or no longer in the manifest)."""
+    def containers(plan: ContainerMap) -> Dict[int, int]:
+        return {block_no: cid for cid, info in plan.items() for block_no in info['blocks']}
+
+    before = containers(previous)
+    after = containers(current)
+    return {
+        block_no: (before.get(block_no), after.get(block_no))
+        for block_no in sorted(set(before) | set(after))
+        if before.get(block_no) != after.get(block_no)
+    }
@@ -1,38 +1,255 @@
-from typing import List, Tuple, Dict, Union
-import pandas as pd
+from typing import List, Tuple, Dict, Set, Union, Optional, Callable, Sequence, TYPE_CHECKING
+import bisect
+import math
+import os
+import threading
+import numpy as np
 import time
 
+from allocator.blocks import dBlock, BlockSet, Blocks, FAST_PATH_MAX_BYTES, _load_blocks_csv, load_block_store
+from allocator.telemetry import Telemetry, active, record, tally
+
+if TYPE_CHECKING:
+    from allocator.cache import SolveCache
+
 # Type alias for clarity
-dBlock = Tuple[int, float]
-ContainerMap = Dict[int, Dict[str, Union[List[int], float]]]
+ContainerMap = Dict[int, Dict[str, Union[List[int], float, bool]]]
+
+
+# Settings for the solvers
+class SOLVER_settings:
+    WEIGHT_PRECISION: int = 2  # Decimal places of a tonne the exact solvers work to
+    DP_MAX_CELLS: int = 50_000_000  # Largest DP table (items x capacity x blocks) solved exactly
+    DP_TIME_LIMIT: float = 1.0  # Seconds an exact solve may spend on one container
+    ALLOCATION_TIME_LIMIT: float = 10.0  # Seconds for the entire allocation
+    MITM_MAX_BLOCKS: int = 45  # Most blocks (that fit a container) solved by meet-in-the-middle
+    GROUP_EQUAL_WEIGHTS: bool = True  # Solve repeated weights as one bounded item
+    CACHE_ENTRIES: int = 4096  # Solves a SolveCache keeps in memory
+    IMPROVE_TIME_LIMIT: float = 2.0  # Seconds the improvement pass may spend after an allocation
+    IMPROVE_SCAN: int = 64  # Pool candidates an improvement move looks at before giving up
+    FILL_TOLERANCE: float = 0.0  # Tonnes below capacity the bitset engine accepts as a full container
+
+
+class Deadline:
+    """Cooperative time budget that solvers poll inside their inner loops.
+    A deadline may be nested in a parent, in which case it expires with it.
+    cancel() expires it immediately and is safe to call from another thread."""
+
+    def __init__(self, budget: Optional[float] = None, parent: Optional['Deadline'] = None) -> None:
+        self.expires_at = time.monotonic() + budget if budget is not None else None
+        self.parent = parent
+        self._cancelled = threading.Event()
+
+    def cancel(self) -> None:
+        self._cancelled.set()
+
+    def cancelled(self) -> bool:
+        if self._cancelled.is_set():
+            return True
+        return self.parent is not None and self.parent.cancelled()
+
+    def expired(self) -> bool:
+        if self._cancelled.is_set():
+            return True
+        if self.parent is not None and self.parent.expired():
+            return True
+        return self.expires_at is not None and time.monotonic() >= self.expires_at
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left before expiry, or None when there is no limit."""
+        limits = []
+        if self.expires_at is not None:
+            limits.append(self.expires_at - time.monotonic())
+        if self.parent is not None and self.parent.remaining() is not None:
+            limits.append(self.parent.remaining())
+        return max(0.0, min(limits)) if limits else None
 
 
-def load_blocks(path: str) -> List[dBlock]:
-    """Load CSV and return list of (BlockNo, Weight).
-    Ensures the required columns exist and handles potential errors."""
+def load_blocks(path: str) -> BlockSet:
+    """Load CSV and return the blocks as a BlockSet of (BlockNo, Weight), with Volume, L, H, W if present.
+    Ensures the required columns exist and handles potential errors. Small plain files are read by the
+    stdlib fast path; anything else goes through load_block_store, which reports invalid rows by line."""
     try:
-        df = pd.read_csv(path)
-        
-        # Verify required columns exist
-        required_cols = ['BlockNo', 'Weight']
-        for col in required_cols:
-            if col not in df.columns:
-                raise ValueError(f"Required column '{col}' not found in CSV file")
-        
-        # Check for invalid values
-        if df['BlockNo'].isna().any():
-            raise ValueError("CSV contains empty BlockNo values")
-        if df['Weight'].isna().any():
-            raise ValueError("CSV contains empty Weight values")
-        
-        return list(df[['BlockNo', 'Weight']].itertuples(index=False, name=None))
+        blocks = _load_blocks_csv(path) if os.path.getsize(path) <= FAST_PATH_MAX_BYTES else None
     except Exception as e:
         raise ValueError(f"Error loading CSV file: {str(e)}")
+    if blocks is None:
+        blocks = load_block_store(path, sizes=True)
+    return blocks
+
+
+def _weight_units(weights: np.ndarray, precision: int) -> np.ndarray:
+    """Weights as whole multiples of 10^-precision tonnes, rounded up, so blocks that fit
+    a capacity in these units also fit it in tonnes."""
+    # Round first so 25.3 * 100 = 2530.0000000000005 still counts as 2530
+    return np.ceil(np.round(weights * 10 ** precision, 6)).astype(np.int64)
+
+
+def _scale_weights(blocks: Blocks, capacity: float, precision: int = None) -> Tuple[List[int], int]:
+    """Scale block weights and capacity to integer units for the exact engines.
+    Weights are rounded up to `precision` decimal places and capacity is rounded down, so data
+    recorded more finely never overfills a container. Both are then divided by the GCD of the
+    weights, so data recorded to 0.1 t or 0.5 t gives a narrower table."""
+    if precision is None:
+        precision = SOLVER_settings.WEIGHT_PRECISION
+    if precision < 0:
+        raise ValueError("Weight precision cannot be negative")
+    scaled = _weight_units(BlockSet.from_blocks(blocks).weight, precision)
+    # Round first so 25.3 * 100 = 2529.9999... still counts as 2530
+    capacity_scaled = math.floor(round(capacity * 10 ** precision, 6))
+
+    unit = int(np.gcd.reduce(scaled)) if len(scaled) else 0
+    if unit > 1:
+        scaled //= unit
+        capacity_scaled //= unit
+    return scaled.tolist(), capacity_scaled
+
+
+def _max_fit(scaled: List[int], capacity_scaled: int) -> int:
+    """Largest number of blocks that can share a container, taking the lightest first."""
+    count = 0
+    total = 0
+    for w in sorted(scaled):
+        total += w
+        if total > capacity_scaled:
+            break
+        count += 1
+    return count
 
 
-def find_best_subset_dp(blocks: List[dBlock], capacity: float, max_blocks: int = None) -> Tuple[List[dBlock], float]:
+def _dp_select(weights: Union[List[float], np.ndarray], scaled: List[int], capacity_scaled: int, max_blocks: int,
+               deadline: Optional[Deadline] = None, counts: Optional[List[int]] = None) -> Tuple[List[int], bool]:
+    """Return positions of the optimal subset (last item first) and whether every item was considered.
+    Keeps one rolling (capacity x blocks) layer and a bit-packed choice matrix per item.
+    An item may stand for several blocks, given by `counts` (one each by default).
+    If the deadline expires the subset is optimal for the items processed so far."""
+    # best[j][k] = best weight using the items seen so far, capacity j, at most k blocks
+    best = np.zeros((capacity_scaled + 1, max_blocks + 1))
+    choices = []
+
+    if counts is None:
+        counts = [1] * len(scaled)
+
+    complete = True
+    for weight, w, c in zip(weights, scaled, counts):
+        if deadline is not None and deadline.expired():
+            complete = False
+            break
+        choices.append(_dp_add(best, weight, w, c))
+
+    if active() is not None:
+        record(table_bytes=best.nbytes + sum(packed.nbytes for packed in choices if packed is not None))
+    return _dp_reconstruct(best, choices, scaled, counts, capacity_scaled), complete
+
+
+def _dp_add(best: np.ndarray, weight: float, w: int, c: int = 1) -> Optional[np.ndarray]:
+    """Fold one item into the DP layer in place and return its bit-packed choice matrix,
+    or None when it can never be chosen."""
+    capacity_scaled = best.shape[0] - 1
+    max_blocks = best.shape[1] - 1
+    if w > capacity_scaled or c > max_blocks:
+        # Never fits, so it can never be chosen
+        return None
+
+    span = capacity_scaled + 1 - w
+    with_block = best[:span, :-c] + weight
+    take = with_block > best[w:, c:]
+    best[w:, c:] = np.where(take, with_block, best[w:, c:])
+    return np.packbits(take, axis=None)
+
+
+def _dp_reconstruct(best: np.ndarray, choices: List[Optional[np.ndarray]], scaled: List[int], counts: List[int],
+                    capacity_scaled: int, block_limit: Optional[int] = None) -> List[int]:
+    """Walk the choice matrices back from capacity `capacity_scaled` and at most `block_limit` blocks,
+    which may be below what the table was built for. Returns positions of the chosen items, last item first."""
+    max_blocks = best.shape[1] - 1
+    # Find the best k (number of blocks to use), smallest k on ties
+    row = best[capacity_scaled] if block_limit is None else best[capacity_scaled, :block_limit + 1]
+    if row.max() <= 0.0:
+        return []
+    k = int(np.argmax(row))
+    j = capacity_scaled
+
+    positions = []
+    for i in range(len(choices) - 1, -1, -1):
+        if k == 0:
+            break
+        packed = choices[i]
+        w = scaled[i]
+        c = counts[i]
+        if packed is None or j < w or k < c:
+            continue
+        bit = (j - w) * (max_blocks + 1 - c) + (k - c)
+        if packed[bit >> 3] & (0x80 >> (bit & 7)):
+            positions.append(i)
+            j -= w
+            k -= c
+    return positions
+
+
+def _bitset_select(scaled: List[int], capacity_scaled: int, tolerance_scaled: int = 0,
+                   deadline: Optional[Deadline] = None) -> Tuple[List[int], bool, bool]:
+    """Subset-sum without a block limit: reachable sums are the bits of one big integer,
+    updated with a shift-or per block. For each sum the first block that reached it is kept,
+    which is enough to walk the subset back. Stops once a sum within `tolerance_scaled` of
+    capacity is reachable. Returns (positions, complete, full) where full means it stopped early."""
+    mask = (1 << (capacity_scaled + 1)) - 1
+    low = max(capacity_scaled - tolerance_scaled, 0)
+    reach = 1
+    first = np.full(capacity_scaled + 1, -1, dtype=np.int32)
+
+    complete = True
+    full = False
+    for i, w in enumerate(scaled):
+        if deadline is not None and deadline.expired():
+            complete = False
+            break
+        if w <= 0 or w > capacity_scaled:
+            continue
+        new = (reach << w) & mask & ~reach
+        if not new:
+            continue
+        reach |= new
+        # Only sums reached for the first time get a back-pointer
+        bits = np.unpackbits(np.frombuffer(new.to_bytes((new.bit_length() + 7) // 8, 'little'), dtype=np.uint8),
+                             bitorder='little')
+        first[np.flatnonzero(bits)] = i
+        if reach >> low:
+            full = True
+            break
+    if active() is not None:
+        record(table_bytes=first.nbytes + (capacity_scaled + 8) // 8)
+
+    # Each back-pointer names an earlier block than the one before it, so no block is used twice
+    j = reach.bit_length() - 1
+    positions = []
+    while j > 0:
+        i = int(first[j])
+        positions.append(i)
+        j -= scaled[i]
+    return positions, complete, full
+
+
+def find_best_subset_bitset(blocks: Blocks, capacity: float, precision: int = None,
+                            tolerance: float = 0.0) -> Tuple[List[dBlock], float]:
+    """Find the best subset of blocks, with no block limit, by bitset subset-sum.
+    Returns as soon as the container can be filled to within `tolerance` tonnes of capacity."""
+    blocks = BlockSet.from_blocks(blocks)
+    if not blocks or capacity <= 0:
+        return [], 0.0
+
+    scaled, capacity_scaled = _scale_weights(blocks, capacity, precision)
+    tolerance_scaled = _scale_weights(blocks, tolerance, precision)[1] if tolerance > 0 else 0
+    positions, _, _ = _bitset_select(scaled, capacity_scaled, tolerance_scaled)
+    return [blocks[i] for i in positions], blocks.total_weight(positions)
+
+
+def find_best_subset_dp(blocks: Blocks, capacity: float, max_blocks: int = None,
+                        precision: int = None) -> Tuple[List[dBlock], float]:
     """Find the best subset of blocks using dynamic programming.
-    More efficient than recursion while still finding optimal solution."""
+    The table is held as NumPy layers, so memory grows with capacity x blocks rather than n x capacity x blocks.
+    When the block limit cannot bind, the cheaper bitset subset-sum is used instead."""
+    blocks = BlockSet.from_blocks(blocks)
     n = len(blocks)
     
     # Handle edge cases
@@ -41,160 +258,819 @@ def find_best_subset_dp(blocks: List[dBlock], capacity: float, max_blocks: int =
     
     # If max_blocks is None or greater than total blocks, use full capacity
     max_blocks_to_use = min(n, max_blocks) if max_blocks is not None else n
+
+    scaled, capacity_scaled = _scale_weights(blocks, capacity, precision)
+    # No container can hold more blocks than the lightest ones that fit
+    max_fit = _max_fit(scaled, capacity_scaled)
+    if max_blocks_to_use >= max_fit:
+        # The limit never binds, so this is plain subset-sum
+        positions, _, _ = _bitset_select(scaled, capacity_scaled)
+        return [blocks[i] for i in positions], blocks.total_weight(positions)
+    max_blocks_to_use = min(max_blocks_to_use, max_fit)
+    if max_blocks_to_use <= 0:
+        return [], 0.0
+
+    positions, _ = _dp_select(blocks.weight, scaled, capacity_scaled, max_blocks_to_use)
+    result = [blocks[i] for i in positions]
     
-    # Create arrays for our dynamic programming approach
-    # dp[i][j][k] = best weight for first i blocks, capacity j, using k blocks
-    dp = {}
-    chosen = {}
-    
-    # Initialize
-    for i in range(n+1):
-        dp[i] = {}
-        chosen[i] = {}
-        for j in range(int(capacity*100) + 1):  # Scale to handle floating point
-            dp[i][j] = {}
-            chosen[i][j] = {}
-            for k in range(max_blocks_to_use + 1):
-                dp[i][j][k] = 0.0
-                chosen[i][j][k] = False
-    
-    # Fill the dp table
-    for i in range(1, n+1):
-        block_no, weight = blocks[i-1]
-        weight_scaled = int(weight * 100)  # Scale to handle floating point
-        
-        for j in range(int(capacity*100) + 1):
-            for k in range(1, max_blocks_to_use + 1):
-                # Don't include this block
-                dp[i][j][k] = dp[i-1][j][k]
-                
-                # Include this block if it fits
-                if j >= weight_scaled:
-                    with_block = dp[i-1][j-weight_scaled][k-1] + weight
-                    if with_block > dp[i][j][k]:
-                        dp[i][j][k] = with_block
-                        chosen[i][j][k] = True
-    
-    # Reconstruct the solution
-    result = []
-    j = int(capacity * 100)
-    k = max_blocks_to_use
-    
-    # Find the best k (number of blocks to use)
-    best_k = 0
-    best_value = 0.0
-    for potential_k in range(max_blocks_to_use + 1):
-        if dp[n][j][potential_k] > best_value:
-            best_value = dp[n][j][potential_k]
-            best_k = potential_k
-    
-    k = best_k
-    
-    for i in range(n, 0, -1):
-        if chosen[i][j][k]:
-            block_no, weight = blocks[i-1]
-            result.append(blocks[i-1])
-            j -= int(weight * 100)
-            k -= 1
-    
-    total_weight = sum(block[1] for block in result)
+    total_weight = blocks.total_weight(positions)
     return result, total_weight
 
 
-def find_best_subset_greedy(blocks: List[dBlock], capacity: float, max_blocks: int = None) -> Tuple[List[dBlock], float]:
-    """Find a good subset of blocks using a greedy approach.
-    This is more efficient but may not find the optimal solution."""
+def _piece_sizes(copies: int, w: int, capacity_scaled: int, max_blocks: int) -> List[int]:
+    """Split `copies` blocks of scaled weight `w` into binary pieces: 13 copies become pieces of
+    1, 2, 4 and 6 blocks, which can make up any count from 0 to 13."""
+    # More copies than fit in one container are never useful
+    available = min(copies, max_blocks, capacity_scaled // w if w else copies)
+    sizes = []
+    size = 1
+    while available > 0:
+        take = min(size, available)
+        sizes.append(take)
+        available -= take
+        size *= 2
+    return sizes
+
+
+def _group_pieces(scaled: List[int], capacity_scaled: int,
+                  max_blocks: int) -> Tuple[List[List[int]], List[int], List[int], List[int]]:
+    """Collapse equal weights into groups and split each group into binary pieces.
+    Returns (groups of positions, piece weights, piece block counts, piece group)."""
+    members: Dict[int, List[int]] = {}
+    for i, w in enumerate(scaled):
+        if w <= capacity_scaled:
+            members.setdefault(w, []).append(i)
+
+    groups = list(members.values())
+    piece_weights: List[int] = []
+    piece_counts: List[int] = []
+    piece_group: List[int] = []
+    for g, positions in enumerate(groups):
+        w = scaled[positions[0]]
+        for take in _piece_sizes(len(positions), w, capacity_scaled, max_blocks):
+            piece_weights.append(w * take)
+            piece_counts.append(take)
+            piece_group.append(g)
+    return groups, piece_weights, piece_counts, piece_group
+
+
+def _grouped_select(scaled: List[int], capacity_scaled: int, max_blocks: int,
+                    deadline: Optional[Deadline] = None) -> Tuple[List[int], bool]:
+    """Solve the bounded knapsack over equal-weight groups, then map the chosen
+    counts back to concrete positions (earliest rows of each group first)."""
+    groups, piece_weights, piece_counts, piece_group = _group_pieces(scaled, capacity_scaled, max_blocks)
+    chosen, complete = _dp_select([float(w) for w in piece_weights], piece_weights, capacity_scaled,
+                                  max_blocks, deadline, piece_counts)
+
+    taken = [0] * len(groups)
+    for piece in chosen:
+        taken[piece_group[piece]] += piece_counts[piece]
+    positions = []
+    for g, count in enumerate(taken):
+        positions.extend(groups[g][:count])
+    return positions, complete
+
+
+class SharedDP:
+    """One bounded-knapsack table over a pool of blocks, built up to the largest capacity of a fleet.
+    Any smaller capacity is answered by reading its row. Equal weights form one group, split into
+    binary pieces, and groups are folded in lightest first with a checkpoint every few pieces, so
+    removing blocks only refolds the pieces after the checkpoint before the first group affected.
+    Blocks added later are folded in as extra pieces at the end, one (capacity x blocks) update each."""
+
+    def __init__(self, scaled: List[int], capacity_scaled: int, max_blocks: int,
+                 deadline: Optional[Deadline] = None) -> None:
+        members: Dict[int, List[int]] = {}
+        for i, w in enumerate(scaled):
+            if w <= capacity_scaled:
+                members.setdefault(w, []).append(i)
+        self.group_weights = sorted(members)
+        self.members = [members[w] for w in self.group_weights]
+        self.best = np.zeros((capacity_scaled + 1, max_blocks + 1))
+        # Pieces as (group, block count); group_start[g] is the index of the first piece of group g
+        self.pieces: List[Tuple[int, int]] = []
+        self.group_start: List[int] = []
+        self.choices: List[Optional[np.ndarray]] = []
+        self.checkpoints: List[np.ndarray] = []
+        # Groups with pieces added after their own split, at the end of the table
+        self.extra_groups: Set[int] = set()
+        self._split(0)
+        self.stride = max(1, math.isqrt(len(self.pieces)))
+        self.complete = self._build(0, deadline)
+
+    def _split(self, first_group: int) -> None:
+        """Recompute the binary pieces of every group from `first_group` on."""
+        capacity_scaled = self.best.shape[0] - 1
+        max_blocks = self.best.shape[1] - 1
+        start = self.group_start[first_group] if first_group < len(self.group_start) else len(self.pieces)
+        del self.pieces[start:]
+        del self.group_start[first_group:]
+        for g in range(first_group, len(self.members)):
+            self.group_start.append(len(self.pieces))
+            for take in _piece_sizes(len(self.members[g]), self.group_weights[g], capacity_scaled, max_blocks):
+                self.pieces.append((g, take))
+
+    def _build(self, start: int, deadline: Optional[Deadline]) -> bool:
+        """Refold pieces from `start` (a multiple of stride) onwards. Returns False if the deadline expired."""
+        del self.choices[start:]
+        del self.checkpoints[-(-start // self.stride):]
+        for i in range(start, len(self.pieces)):
+            if deadline is not None and deadline.expired():
+                return False
+            if i % self.stride == 0:
+                self.checkpoints.append(self.best.copy())
+            g, c = self.pieces[i]
+            w = self.group_weights[g] * c
+            self.choices.append(_dp_add(self.best, float(w), w, c))
+        return True
+
+    def select(self, capacity_scaled: int, max_blocks: Optional[int] = None) -> List[int]:
+        """Positions into the pool of the best subset within `capacity_scaled` and `max_blocks`
+        (earliest rows of each weight)."""
+        capacity_scaled = min(capacity_scaled, self.best.shape[0] - 1)
+        pieces = self.pieces[:len(self.choices)]
+        chosen = _dp_reconstruct(self.best, self.choices, [self.group_weights[g] * c for g, c in pieces],
+                                 [c for _, c in pieces], capacity_scaled, max_blocks)
+        taken: Dict[int, int] = {}
+        for i in chosen:
+            g, c = pieces[i]
+            taken[g] = taken.get(g, 0) + c
+        return [p for g, c in sorted(taken.items()) for p in self.members[g][:c]]
+
+    def remove(self, positions: List[int], deadline: Optional[Deadline] = None) -> bool:
+        """Drop blocks from the pool. Returns False if the deadline expired before the table was whole again."""
+        removed = set(positions)
+        groups = [g for g in range(len(self.members)) if removed.intersection(self.members[g])]
+        if not groups:
+            return self.complete
+        for g in groups:
+            self.members[g] = [p for p in self.members[g] if p not in removed]
+        # Refolding from an earlier group than any with extra pieces splits those afresh
+        first = min(groups[:1] + list(self.extra_groups))
+        self.extra_groups.clear()
+        start = self.group_start[first] - self.group_start[first] % self.stride
+        self._split(first)
+        self.best = self.checkpoints[start // self.stride].copy()
+        self.complete = self._build(start, deadline)
+        return self.complete
+
+    def add(self, scaled: Sequence[Tuple[int, int]], deadline: Optional[Deadline] = None) -> bool:
+        """Add blocks to the pool, given as (position, scaled weight). A block of a weight already in
+        the pool becomes an extra piece of its group, a new weight a new group; either way only the
+        new pieces are folded in. Returns False if the deadline expired before they all were."""
+        capacity_scaled = self.best.shape[0] - 1
+        max_blocks = self.best.shape[1] - 1
+        added: Dict[int, List[int]] = {}
+        for p, w in scaled:
+            if w <= capacity_scaled:
+                added.setdefault(w, []).append(p)
+        group_of = {w: g for g, w in enumerate(self.group_weights)}
+        for w, positions in sorted(added.items()):
+            g = group_of.get(w)
+            if g is None:
+                g = len(self.members)
+                self.group_weights.append(w)
+                self.members.append([])
+                self.group_start.append(len(self.pieces))
+            else:
+                self.extra_groups.add(g)
+            self.members[g].extend(positions)
+            for take in _piece_sizes(len(positions), w, capacity_scaled, max_blocks):
+                self.pieces.append((g, take))
+        self.complete = self._build(len(self.choices), deadline)
+        return self.complete
+
+
+def find_best_subset_grouped(blocks: Blocks, capacity: float, max_blocks: int = None,
+                             precision: int = None) -> Tuple[List[dBlock], float]:
+    """Find the best subset of blocks by treating equal weights as one bounded item.
+    Exact, and much smaller than the plain DP when weights repeat."""
+    blocks = BlockSet.from_blocks(blocks)
+    if not blocks or capacity <= 0:
+        return [], 0.0
+
+    scaled, capacity_scaled = _scale_weights(blocks, capacity, precision)
+    max_blocks_to_use = min(len(blocks), max_blocks) if max_blocks is not None else len(blocks)
+    max_blocks_to_use = min(max_blocks_to_use, _max_fit(scaled, capacity_scaled))
+    if max_blocks_to_use <= 0:
+        return [], 0.0
+
+    positions, _ = _grouped_select(scaled, capacity_scaled, max_blocks_to_use)
+    return [blocks[i] for i in positions], blocks.total_weight(positions)
+
+
+def _mitm_half(scaled: List[int], positions: List[int], capacity_scaled: int, max_blocks: int,
+               deadline: Optional[Deadline] = None) -> Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """Enumerate the subset sums of one half as (sums, block counts, bit masks), sorted by sum.
+    Sums above capacity are dropped and each sum keeps only its fewest-blocks subset,
+    so the half never grows beyond capacity + 1 entries. Returns None if the deadline expires."""
+    sums = np.zeros(1, dtype=np.int64)
+    counts = np.zeros(1, dtype=np.int64)
+    masks = np.zeros(1, dtype=np.int64)
+    for bit, i in enumerate(positions):
+        if deadline is not None and deadline.expired():
+            return None
+        new_sums = sums + scaled[i]
+        tally('nodes', len(new_sums))
+        fits = (new_sums <= capacity_scaled) & (counts < max_blocks)
+        sums = np.concatenate((sums, new_sums[fits]))
+        counts = np.concatenate((counts, counts[fits] + 1))
+        masks = np.concatenate((masks, masks[fits] | (1 << bit)))
+
+        # Keep the fewest-blocks subset for every sum
+        order = np.lexsort((counts, sums))
+        sums, counts, masks = sums[order], counts[order], masks[order]
+        first = np.ones(len(sums), dtype=bool)
+        first[1:] = sums[1:] != sums[:-1]
+        sums, counts, masks = sums[first], counts[first], masks[first]
+    return sums, counts, masks
+
+
+def _mitm_select(scaled: List[int], capacity_scaled: int, max_blocks: int,
+                 deadline: Optional[Deadline] = None) -> Tuple[List[int], bool]:
+    """Return positions of a subset with the largest scaled weight and whether the search finished.
+    Each half is enumerated separately and the halves are merged with a sorted search,
+    respecting the max_blocks limit on the combined count."""
+    fitting = [i for i, w in enumerate(scaled) if w <= capacity_scaled]
+    half = len(fitting) // 2
+    if len(fitting) - half > 62:
+        # Subsets are tracked as int64 bit masks
+        raise ValueError("Too many blocks for a meet-in-the-middle search")
+    left = _mitm_half(scaled, fitting[:half], capacity_scaled, max_blocks, deadline)
+    right = _mitm_half(scaled, fitting[half:], capacity_scaled, max_blocks, deadline) if left is not None else None
+    if left is None or right is None:
+        return [], False
+    left_sums, left_counts, left_masks = left
+    right_sums, right_counts, right_masks = right
+
+    best_total = -1
+    best_pair = (0, 0)
+    for count in np.unique(left_counts):
+        # Right-hand subsets that still fit in the block limit, sorted by sum
+        allowed = np.flatnonzero(right_counts <= max_blocks - count)
+        if len(allowed) == 0:
+            continue
+        candidates = np.flatnonzero(left_counts == count)
+        room = capacity_scaled - left_sums[candidates]
+        match = np.searchsorted(right_sums[allowed], room, side='right') - 1
+        totals = left_sums[candidates] + right_sums[allowed[match]]
+        pick = int(np.argmax(totals))
+        if totals[pick] > best_total:
+            best_total = int(totals[pick])
+            best_pair = (int(candidates[pick]), int(allowed[match[pick]]))
+
+    left_mask = int(left_masks[best_pair[0]])
+    right_mask = int(right_masks[best_pair[1]])
+    positions = [i for bit, i in enumerate(fitting[:half]) if left_mask >> bit & 1]
+    positions += [i for bit, i in enumerate(fitting[half:]) if right_mask >> bit & 1]
+    return positions, True
+
+
+def find_best_subset_mitm(blocks: Blocks, capacity: float, max_blocks: int = None,
+                          precision: int = None) -> Tuple[List[dBlock], float]:
+    """Find the best subset of blocks with a meet-in-the-middle search.
+    Exact, and its cost depends on the number of blocks rather than the capacity resolution."""
+    blocks = BlockSet.from_blocks(blocks)
+    if not blocks or capacity <= 0:
+        return [], 0.0
+
+    scaled, capacity_scaled = _scale_weights(blocks, capacity, precision)
+    max_blocks_to_use = min(len(blocks), max_blocks) if max_blocks is not None else len(blocks)
+    if max_blocks_to_use <= 0:
+        return [], 0.0
+
+    positions, _ = _mitm_select(scaled, capacity_scaled, max_blocks_to_use)
+    return [blocks[i] for i in positions], blocks.total_weight(positions)
+
+
+def _greedy_select(blocks: BlockSet, capacity: float, max_blocks: int = None) -> List[int]:
+    """Return positions of the heaviest-first greedy subset."""
     # Sort blocks by weight/mass ratio in descending order for better greedy results
-    sorted_blocks = sorted(blocks, key=lambda x: x[1], reverse=True)
+    order = np.argsort(-blocks.weight, kind='stable').tolist()
+    weights = blocks.weight.tolist()
     
-    selected_blocks = []
+    selected = []
     total_weight = 0.0
     
     # Try to find a good solution
-    for block in sorted_blocks:
+    for i in order:
         # If adding this block doesn't exceed capacity
-        if total_weight + block[1] <= capacity:
+        if total_weight + weights[i] <= capacity:
             # And doesn't exceed max_blocks (if specified)
-            if max_blocks is None or len(selected_blocks) < max_blocks:
-                selected_blocks.append(block)
-                total_weight += block[1]
+            if max_blocks is None or len(selected) < max_blocks:
+                selected.append(i)
+                total_weight += weights[i]
     
-    return selected_blocks, total_weight
+    return selected
 
 
-def find_best_subset(blocks: List[dBlock], capacity: float, max_blocks: int = None) -> Tuple[List[dBlock], float]:
-    """Find the best subset of blocks that fits within capacity and max_blocks constraint.
-    Selects the appropriate algorithm based on input size and constraints."""
-    # Handle edge cases
+def find_best_subset_greedy(blocks: Blocks, capacity: float, max_blocks: int = None) -> Tuple[List[dBlock], float]:
+    """Find a good subset of blocks using a greedy approach.
+    This is more efficient but may not find the optimal solution."""
+    blocks = BlockSet.from_blocks(blocks)
+    positions = _greedy_select(blocks, capacity, max_blocks)
+    return [blocks[i] for i in positions], blocks.total_weight(positions)
+
+
+def _local_select(blocks: Blocks, capacity: float, max_blocks: int = None,
+                  deadline: Optional[Deadline] = None, precision: int = None) -> List[int]:
+    """Return positions of a subset improved from greedy by add, 1-for-1, 2-for-1 and 1-for-2
+    exchanges against the unused blocks. Applies the best exchange until none helps or the deadline expires."""
     if not blocks or capacity <= 0:
-        return [], 0.0
-    
-    # Set max_blocks to total blocks if not specified
-    if max_blocks is None:
-        max_blocks = len(blocks)
-    
-    # For small datasets, use dynamic programming for optimal solution
-    if len(blocks) <= 20:
-        start_time = time.time()
-        result = find_best_subset_dp(blocks, capacity, max_blocks)
-        elapsed = time.time() - start_time
-        
-        # If DP takes too long, fallback to greedy
-        if elapsed > 1.0:  # More than 1 second
-            return find_best_subset_greedy(blocks, capacity, max_blocks)
-        return result
-    
-    # For larger datasets, use greedy approach
-    return find_best_subset_greedy(blocks, capacity, max_blocks)
+        return []
+
+    scaled, capacity_scaled = _scale_weights(blocks, capacity, precision)
+    limit = max_blocks if max_blocks is not None else len(blocks)
+
+    # Greedy start: heaviest blocks first
+    selected: List[int] = []
+    load = 0
+    for i in sorted(range(len(blocks)), key=lambda i: -scaled[i]):
+        if len(selected) < limit and load + scaled[i] <= capacity_scaled:
+            selected.append(i)
+            load += scaled[i]
+
+    while load < capacity_scaled and not (deadline is not None and deadline.expired()):
+        in_use = set(selected)
+        unused = sorted((i for i in range(len(blocks)) if i not in in_use), key=lambda i: scaled[i])
+        unused_weights = [scaled[i] for i in unused]
+        slack = capacity_scaled - load
+
+        def heaviest_unused(room: int) -> int:
+            # Position in `unused` of the heaviest block not above `room`, or -1
+            return bisect.bisect_right(unused_weights, room) - 1
+
+        best_gain = 0
+        best_move: Tuple[List[int], List[int]] = ([], [])
 
+        if len(selected) < limit:
+            b = heaviest_unused(slack)
+            if b >= 0 and unused_weights[b] > best_gain:
+                best_gain, best_move = unused_weights[b], ([], [b])
+
+        for x, a in enumerate(selected):
+            # Swap one selected block for one unused block
+            room = slack + scaled[a]
+            b = heaviest_unused(room)
+            if b >= 0 and unused_weights[b] - scaled[a] > best_gain:
+                best_gain, best_move = unused_weights[b] - scaled[a], ([x], [b])
+
+            # Swap one selected block for two unused blocks
+            if len(selected) < limit:
+                lo, hi = 0, heaviest_unused(room)
+                while lo < hi:
+                    pair = unused_weights[lo] + unused_weights[hi]
+                    if pair > room:
+                        hi -= 1
+                        continue
+                    if pair - scaled[a] > best_gain:
+                        best_gain, best_move = pair - scaled[a], ([x], [lo, hi])
+                    lo += 1
+
+            # Swap two selected blocks for one unused block
+            for y in range(x + 1, len(selected)):
+                pair = scaled[a] + scaled[selected[y]]
+                b = heaviest_unused(slack + pair)
+                if b >= 0 and unused_weights[b] - pair > best_gain:
+                    best_gain, best_move = unused_weights[b] - pair, ([x, y], [b])
+
+        if best_gain <= 0:
+            break
+        removed, added = best_move
+        for x in sorted(removed, reverse=True):
+            selected.pop(x)
+        selected.extend(unused[b] for b in added)
+        load += best_gain
 
-def assign_containers(blocks: List[dBlock], capacity: float, count: int, max_blocks: int = None) -> ContainerMap:
-    """Pack blocks into `count` containers with optional max blocks per container limit."""
-    # Input validation
-    if capacity <= 0:
+    return selected
+
+
+def find_best_subset_local(blocks: Blocks, capacity: float, max_blocks: int = None,
+                           deadline: Optional[Deadline] = None, precision: int = None) -> Tuple[List[dBlock], float]:
+    """Find a good subset of blocks by local search from the greedy answer."""
+    blocks = BlockSet.from_blocks(blocks)
+    positions = _local_select(blocks, capacity, max_blocks, deadline, precision)
+    return [blocks[i] for i in positions], blocks.total_weight(positions)
+
+
+def _volume_select(scaled: List[int], volumes: np.ndarray, capacity_scaled: int, volume_limit: float,
+                   max_blocks: int, deadline: Optional[Deadline] = None) -> Tuple[List[int], bool]:
+    """Return positions of the heaviest subset within both the weight and the volume limit,
+    and whether every block was considered. The table has the same (capacity x blocks) shape as
+    the weight-only DP, but holds the least volume that reaches exactly that weight and count,
+    so the volume limit adds no dimension to it."""
+    # least[j][k] = least volume of k of the blocks seen so far weighing exactly j
+    least = np.full((capacity_scaled + 1, max_blocks + 1), np.inf)
+    least[0, 0] = 0.0
+    choices = []
+
+    complete = True
+    for w, v in zip(scaled, volumes.tolist()):
+        if deadline is not None and deadline.expired():
+            complete = False
+            break
+        if w > capacity_scaled or v > volume_limit:
+            choices.append(None)
+            continue
+
+        span = capacity_scaled + 1 - w
+        with_block = least[:span, :-1] + v
+        take = with_block < least[w:, 1:]
+        least[w:, 1:] = np.where(take, with_block, least[w:, 1:])
+        choices.append(np.packbits(take, axis=None))
+
+    if active() is not None:
+        record(table_bytes=least.nbytes + sum(packed.nbytes for packed in choices if packed is not None))
+    # Heaviest weight some count of blocks reaches within the volume limit, fewest blocks on ties
+    feasible = least <= volume_limit
+    weights_reached = np.flatnonzero(feasible.any(axis=1))
+    j = int(weights_reached[-1])
+    k = int(np.argmax(feasible[j]))
+
+    positions = []
+    for i in range(len(choices) - 1, -1, -1):
+        if k == 0:
+            break
+        packed = choices[i]
+        w = scaled[i]
+        if packed is None or j < w:
+            continue
+        bit = (j - w) * max_blocks + (k - 1)
+        if packed[bit >> 3] & (0x80 >> (bit & 7)):
+            positions.append(i)
+            j -= w
+            k -= 1
+    return positions, complete
+
+
+def _greedy_volume_select(blocks: BlockSet, capacity: float, volume_limit: float, max_blocks: int = None) -> List[int]:
+    """Return positions of the heaviest-first greedy subset within both the weight and the volume limit."""
+    weights = blocks.weight.tolist()
+    volumes = blocks.volume.tolist()
+    selected = []
+    total_weight = 0.0
+    total_volume = 0.0
+    for i in np.argsort(-blocks.weight, kind='stable').tolist():
+        if max_blocks is not None and len(selected) >= max_blocks:
+            break
+        if total_weight + weights[i] <= capacity and total_volume + volumes[i] <= volume_limit:
+            selected.append(i)
+            total_weight += weights[i]
+            total_volume += volumes[i]
+    return selected
+
+
+def _select_with_volume(blocks: BlockSet, capacity: float, volume_limit: float, max_blocks: Optional[int],
+                        deadline: Deadline, precision: Optional[int]) -> Tuple[List[int], bool]:
+    """select_best_subset with a volume limit as well: (positions, optimal).
+    The weight-only optimum is tried first, as volume is often not the binding limit."""
+    if blocks.volume is None:
+        raise ValueError("A volume limit needs the Volume column")
+    if np.isnan(blocks.volume).any():
+        raise ValueError("Every block needs a numeric Volume to check a volume limit")
+    # Allow for rounding in the summed volumes
+    volume_limit += 1e-9
+
+    # Blocks too big for the container on their own are never considered
+    fitting = np.flatnonzero(blocks.volume <= volume_limit)
+    pool = blocks.take(fitting)
+    positions, optimal = select_best_subset(pool, capacity, max_blocks, deadline=deadline, precision=precision)
+    if pool.volume[positions].sum() <= volume_limit:
+        return fitting[positions].tolist(), optimal
+
+    scaled, capacity_scaled = _scale_weights(pool, capacity, precision)
+    limit = min(len(pool), max_blocks) if max_blocks is not None else len(pool)
+    limit = min(limit, _max_fit(scaled, capacity_scaled))
+    greedy_positions = _greedy_volume_select(pool, capacity, volume_limit, max_blocks)
+    cells = len(pool) * (capacity_scaled + 1) * (limit + 1)
+    if limit > 0 and cells <= SOLVER_settings.DP_MAX_CELLS:
+        record(engine='volume_dp', dp_cells=cells)
+        positions, complete = _volume_select(scaled, pool.volume, capacity_scaled, volume_limit, limit, deadline)
+        if complete:
+            return fitting[positions].tolist(), True
+        record(timed_out=True)
+        # The DP only covered a prefix of the blocks, keep whichever answer is heavier
+        if pool.total_weight(positions) >= pool.total_weight(greedy_positions):
+            return fitting[positions].tolist(), False
+    else:
+        record(dp_cells=cells, too_large=True)
+    record(engine='greedy_volume')
+    return fitting[greedy_positions].tolist(), False
+
+
+def select_best_subset(blocks: Blocks, capacity: float, max_blocks: int = None,
+                       time_budget: Optional[float] = None, deadline: Optional[Deadline] = None,
+                       precision: int = None, volume: Optional[float] = None,
+                       tolerance: Optional[float] = None) -> Tuple[List[int], bool]:
+    """Pick the best subset reachable within a time budget, as positions into `blocks`.
+    Returns (positions, optimal) where optimal is True only when an exact solve finished.
+    When time runs out the best feasible subset found so far is returned.
+    With `volume` set the subset must also fit that volume (the blocks need a Volume column).
+    Without a binding block limit, a fill within `tolerance` tonnes of capacity (as rounded to the
+    weights' resolution; default FILL_TOLERANCE) is accepted as soon as it is found. It only counts
+    as optimal when it fills the container exactly."""
+    if not len(blocks) or capacity <= 0:
+        return [], True
+    blocks = BlockSet.from_blocks(blocks)
+
+    deadline = Deadline(time_budget, parent=deadline)
+    if volume is not None:
+        return _select_with_volume(blocks, capacity, volume, max_blocks, deadline, precision)
+    n = len(blocks)
+    max_blocks_to_use = min(n, max_blocks) if max_blocks is not None else n
+    if max_blocks_to_use <= 0:
+        return [], True
+
+    scaled, capacity_scaled = _scale_weights(blocks, capacity, precision)
+    max_fit = _max_fit(scaled, capacity_scaled)
+    max_blocks_to_use = min(max_blocks_to_use, max_fit)
+    if max_blocks_to_use <= 0:
+        return [], True
+
+    # No binding block limit: plain subset-sum, which usually reaches a full container within a few blocks
+    if max_blocks_to_use == max_fit and capacity_scaled < SOLVER_settings.DP_MAX_CELLS:
+        if tolerance is None:
+            tolerance = SOLVER_settings.FILL_TOLERANCE
+        tolerance_scaled = _scale_weights(blocks, tolerance, precision)[1] if tolerance > 0 else 0
+        record(engine='bitset')
+        positions, complete, full = _bitset_select(scaled, capacity_scaled, tolerance_scaled, deadline)
+        if full:
+            exact = sum(scaled[i] for i in positions) == capacity_scaled
+            record(early_exit=True)
+            return positions, exact
+        if complete:
+            return positions, True
+        record(timed_out=True)
+        greedy_positions = _greedy_select(blocks, capacity, max_blocks)
+        if blocks.total_weight(greedy_positions) > blocks.total_weight(positions):
+            record(engine='greedy')
+            return greedy_positions, False
+        return positions, False
+
+    # Meet-in-the-middle is exact and independent of the capacity resolution for mid-sized inputs
+    if sum(1 for w in scaled if w <= capacity_scaled) <= SOLVER_settings.MITM_MAX_BLOCKS:
+        record(engine='mitm')
+        positions, complete = _mitm_select(scaled, capacity_scaled, max_blocks_to_use, deadline)
+        if complete:
+            return positions, True
+        record(timed_out=True)
+
+    else:
+        # Repeated weights: solve the (smaller) bounded knapsack over weight groups instead
+        items = n
+        grouped = False
+        if SOLVER_settings.GROUP_EQUAL_WEIGHTS:
+            pieces = len(_group_pieces(scaled, capacity_scaled, max_blocks_to_use)[1])
+            if pieces < n:
+                items, grouped = pieces, True
+
+        cells = items * (capacity_scaled + 1) * (max_blocks_to_use + 1)
+        if cells <= SOLVER_settings.DP_MAX_CELLS:
+            record(engine='grouped' if grouped else 'dp', dp_cells=cells)
+            if grouped:
+                positions, complete = _grouped_select(scaled, capacity_scaled, max_blocks_to_use, deadline)
+            else:
+                positions, complete = _dp_select(blocks.weight, scaled, capacity_scaled, max_blocks_to_use, deadline)
+            if complete:
+                return positions, True
+
+            # The DP only covered a prefix of the blocks, keep whichever answer is heavier
+            record(timed_out=True)
+            greedy_positions = _greedy_select(blocks, capacity, max_blocks)
+            if blocks.total_weight(greedy_positions) > blocks.total_weight(positions):
+                record(engine='greedy')
+                return greedy_positions, False
+            return positions, False
+        record(dp_cells=cells, too_large=True)
+
+    record(engine='greedy')
+    return _greedy_select(blocks, capacity, max_blocks), False
+
+
+def find_best_subset_anytime(blocks: Blocks, capacity: float, max_blocks: int = None,
+                             time_budget: Optional[float] = None, deadline: Optional[Deadline] = None,
+                             precision: int = None) -> Tuple[List[dBlock], float, bool]:
+    """Find the best subset reachable within a time budget.
+    Returns (subset, total weight, optimal); see select_best_subset."""
+    blocks = BlockSet.from_blocks(blocks)
+    positions, optimal = select_best_subset(blocks, capacity, max_blocks, time_budget, deadline, precision)
+    return [blocks[i] for i in positions], blocks.total_weight(positions), optimal
+
+
+def find_best_subset(blocks: Blocks, capacity: float, max_blocks: int = None,
+                     precision: int = None, solver: str = 'auto') -> Tuple[List[dBlock], float]:
+    """Find the best subset of blocks that fits within capacity and max_blocks constraint.
+    Selects the appropriate algorithm based on input size and constraints ('auto'), or with
+    `solver='portfolio'` races several strategies on separate cores and keeps the best."""
+    if solver == 'portfolio':
+        from allocator.portfolio import find_best_subset_portfolio
+        result, total, _ = find_best_subset_portfolio(blocks, capacity, max_blocks,
+                                                      time_budget=SOLVER_settings.DP_TIME_LIMIT, precision=precision)
+        return result, total
+    if solver != 'auto':
+        raise ValueError(f"Unknown solver '{solver}'")
+    result, total, _ = find_best_subset_anytime(blocks, capacity, max_blocks,
+                                                time_budget=SOLVER_settings.DP_TIME_LIMIT, precision=precision)
+    return result, total
+
+
+def _fleet_capacities(capacity: Union[float, Sequence[float]], count: int) -> List[float]:
+    """One payload limit per container, from a single limit or a list of them."""
+    capacities = [capacity] * max(count, 0) if np.isscalar(capacity) else list(capacity)
+    if np.isscalar(capacity) and capacity <= 0 or any(c <= 0 for c in capacities):
         raise ValueError("Container capacity must be greater than 0")
     if count <= 0:
         raise ValueError("Number of containers must be greater than 0")
+    if len(capacities) != count:
+        raise ValueError(f"Expected {count} container capacities, got {len(capacities)}")
+    return capacities
+
+
+def _fleet_table(blocks: BlockSet, available: np.ndarray, capacity: float, max_blocks: Optional[int],
+                 precision: Optional[int], deadline: Deadline) -> Optional[SharedDP]:
+    """The shared table for the `available` blocks, or None if it cannot be built and updated in time."""
+    started = time.perf_counter()
+    table = _shared_table(blocks, capacity, max_blocks, precision,
+                          Deadline(SOLVER_settings.DP_TIME_LIMIT, parent=deadline))
+    if table is not None and not available.all():
+        if not table.remove(np.flatnonzero(~available).tolist(),
+                            Deadline(SOLVER_settings.DP_TIME_LIMIT, parent=deadline)):
+            table = None
+    record(shared_table_time=round(time.perf_counter() - started, 6))
+    return table
+
+
+def _shared_table(blocks: BlockSet, capacity: float, max_blocks: Optional[int], precision: Optional[int],
+                  deadline: Deadline) -> Optional[SharedDP]:
+    """A SharedDP over every block up to `capacity`, or None if it would be too large or too slow."""
+    scaled, capacity_scaled = _scale_weights(blocks, capacity, precision)
+    limit = min(len(blocks), max_blocks) if max_blocks is not None else len(blocks)
+    limit = min(limit, _max_fit(scaled, capacity_scaled))
+    if limit <= 0:
+        return None
+    pieces = len(_group_pieces(scaled, capacity_scaled, limit)[1])
+    cells = pieces * (capacity_scaled + 1) * (limit + 1)
+    record(shared_table_cells=cells)
+    if cells > SOLVER_settings.DP_MAX_CELLS:
+        record(shared_table='too large')
+        return None
+    table = SharedDP(scaled, capacity_scaled, limit, deadline)
+    if active() is not None:
+        record(shared_table='built' if table.complete else 'timed out',
+               shared_table_bytes=table.best.nbytes * (len(table.checkpoints) + 1)
+               + sum(packed.nbytes for packed in table.choices if packed is not None))
+    return table if table.complete else None
+
+
+def assign_containers(blocks: Blocks, capacity: Union[float, Sequence[float]], count: int, max_blocks: int = None,
+                      time_budget: Optional[float] = None, deadline: Optional[Deadline] = None,
+                      strategy: str = 'sequential',
+                      solver: Optional[Callable[..., Tuple[List[int], bool]]] = None,
+                      precision: int = None,
+                      progress: Optional[Callable[[int, int], None]] = None,
+                      volume: Optional[float] = None,
+                      dimensions: Optional[Tuple[float, float, float]] = None,
+                      improver: Optional[Callable[..., ContainerMap]] = None,
+                      telemetry: Optional[Telemetry] = None,
+                      cache: Optional['SolveCache'] = None) -> ContainerMap:
+    """Pack blocks into `count` containers with optional max blocks per container limit.
+    `capacity` is one payload limit for every container, or a list with one per container.
+    `volume` limits the Volume each container takes (each entry then has a 'total_volume'), and
+    blocks that do not fit the container's internal (L, H, W) `dimensions` are left unassigned.
+    The 'sequential' strategy fills one container at a time, by default from one SharedDP table
+    (select_best_subset per container when the table is too large) or with the given `solver`;
+    'global' optimises all of them together. With a `cache` (a cache.SolveCache) each container is
+    looked up first and only misses are solved, the table being built at the first one; every
+    proven optimum is then stored.
+    Blocks are tracked by row index, so each container also lists the 'rows' it holds,
+    and each solve is handed a BlockSet of the rows still unassigned.
+    `progress(done, count)` is called after each container; a cancelled deadline stops the run early.
+    The whole allocation shares one time budget; once it is spent the remaining containers
+    are filled with the best answer the solvers can give immediately.
+    An `improver` such as improve.improve_assignments then gets the finished allocation (with the
+    same limits and the caller's deadline) and returns it with more weight shipped.
+    A `telemetry` collector records what each container's solve did (see allocator.telemetry)."""
+    if telemetry is not None:
+        with telemetry:
+            return assign_containers(blocks, capacity, count, max_blocks, time_budget, deadline, strategy, solver,
+                                     precision, progress, volume, dimensions, improver, cache=cache)
+    blocks = BlockSet.from_blocks(blocks)
+    capacities = _fleet_capacities(capacity, count)
+    if volume is not None and volume <= 0:
+        raise ValueError("Container volume must be greater than 0")
+    if cache is not None and volume is not None:
+        raise ValueError("The solve cache only takes weight limits, not a volume")
+
+    # Track running time to prevent excessive computation; the improvement pass shares the budget
+    if time_budget is None:
+        time_budget = SOLVER_settings.ALLOCATION_TIME_LIMIT
+    allocation_deadline = Deadline(time_budget, parent=deadline)
+    if strategy == 'global':
+        if len(set(capacities)) > 1:
+            raise ValueError("The global strategy needs containers of equal capacity")
+        if volume is not None or dimensions is not None:
+            raise ValueError("The global strategy only supports weight and block count limits")
+        from allocator.multi import assign_containers_global
+        record(strategy='global', blocks=len(blocks))
+        assignments = assign_containers_global(blocks, capacities[0], count, max_blocks, time_budget,
+                                               allocation_deadline, precision)
+        if improver is not None and not allocation_deadline.cancelled():
+            assignments = _run_improver(improver, blocks, assignments, capacities, max_blocks, allocation_deadline,
+                                        precision=precision)
+        if progress is not None:
+            progress(count, count)
+        return assignments
+    if strategy != 'sequential':
+        raise ValueError(f"Unknown allocation strategy '{strategy}'")
     
-    # Make a copy to avoid modifying the original
-    remaining = blocks.copy()
+    # Rows still unassigned; removal is a constant-time flag flip
+    available = np.ones(len(blocks), dtype=bool)
+    if dimensions is not None:
+        available &= blocks.fits_within(dimensions)
     assignments: ContainerMap = {}
+    recorder = active()
+    record(strategy='sequential', blocks=len(blocks))
+    table = None
+    # One table up to the largest capacity answers every container, even in a mixed fleet
+    build_table = solver is None and volume is None and available.any()
+    limits = {}
+    if volume is not None:
+        limits['volume'] = volume
+    if solver is None:
+        solver = select_best_subset
     
-    # Track running time to prevent excessive computation
-    start_time = time.time()
-    timeout = 10.0  # 10 seconds max for the entire allocation
-    
-    for cid in range(1, count + 1):
-        # Check timeout to prevent hanging
-        if time.time() - start_time > timeout:
-            # If we're timing out, process remaining containers with greedy approach
-            while remaining and cid <= count:
-                greedy_combo, greedy_total = find_best_subset_greedy(
-                    remaining[:min(20, len(remaining))], capacity, max_blocks
-                )
-                if not greedy_combo:
-                    break
-                    
-                assignments[cid] = {
-                    'blocks': [b[0] for b in greedy_combo],
-                    'total_weight': greedy_total
-                }
-                for b in greedy_combo:
-                    remaining.remove(b)
-                cid += 1
+    for cid, capacity in enumerate(capacities, start=1):
+        pool = np.flatnonzero(available)
+        if len(pool) == 0 or allocation_deadline.cancelled():
             break
             
-        if not remaining:
-            break
-            
-        combo, total = find_best_subset(remaining, capacity, max_blocks)
+        if recorder is not None:
+            recorder.start_container(cid)
+        positions = None
+        if cache is not None:
+            pool_blocks = blocks.take(pool)
+            positions = cache.lookup(pool_blocks, capacity, max_blocks, precision)
+        if positions is not None:
+            rows = [int(pool[p]) for p in positions]
+            optimal = True
+        else:
+            if build_table:
+                # Built at the first container the cache cannot answer
+                build_table = False
+                table = _fleet_table(blocks, available, max(capacities), max_blocks, precision,
+                                     allocation_deadline)
+            if table is not None:
+                record(engine='shared_dp')
+                rows = table.select(_scale_weights(blocks, capacity, precision)[1])
+                optimal = True
+            else:
+                positions, optimal = solver(
+                    blocks.take(pool), capacity, max_blocks,
+                    time_budget=SOLVER_settings.DP_TIME_LIMIT, deadline=allocation_deadline, precision=precision,
+                    **limits
+                )
+                rows = [int(pool[p]) for p in positions]
+            if cache is not None and optimal:
+                cache.store(pool_blocks, capacity, max_blocks, precision, np.searchsorted(pool, rows).tolist())
         
         assignments[cid] = {
-            'blocks': [b[0] for b in combo],
-            'total_weight': total
+            'blocks': blocks.block_no[rows].tolist(),
+            'total_weight': blocks.total_weight(rows),
+            'optimal': optimal,
+            'rows': rows
         }
+        if volume is not None:
+            assignments[cid]['total_volume'] = float(blocks.volume[rows].sum()) if rows else 0.0
+        if recorder is not None:
+            recorder.finish_container(optimal=optimal, blocks=len(rows), pool=len(pool),
+                                      fill=round(assignments[cid]['total_weight'] / capacity, 6))
         
-        for b in combo:
-            remaining.remove(b)
+        available[rows] = False
+        if table is not None and cid < count:
+            # Fall back to solving container by container if the table cannot be updated in time
+            if not table.remove(rows, Deadline(SOLVER_settings.DP_TIME_LIMIT, parent=allocation_deadline)):
+                record(shared_table=f'dropped after container {cid}')
+                table = None
+        if progress is not None:
+            progress(cid, count)
     
-    return assignments
\ No newline at end of file
+    record(containers=len(assignments), budget_expired=allocation_deadline.expired(),
+           cancelled=allocation_deadline.cancelled())
+    if improver is not None and not allocation_deadline.cancelled():
+        assignments = _run_improver(improver, blocks, assignments, capacities, max_blocks, allocation_deadline,
+                                    precision=precision, volume=volume, dimensions=dimensions)
+    return assignments
+
+
+def _run_improver(improver: Callable[..., ContainerMap], blocks: BlockSet, assignments: ContainerMap,
+                  capacities: List[float], max_blocks: Optional[int], deadline: Optional[Deadline],
+                  **limits) -> ContainerMap:
+    """Call an improvement pass, recording its time and the weight it added."""
+    started = time.perf_counter()
+    improved = improver(blocks, assignments, capacities, max_blocks, deadline=deadline, **limits)
+    if active() is not None:
+        gain = sum(info['total_weight'] for info in improved.values()) - sum(
+            info['total_weight'] for info in assignments.values())
+        record(improve_time=round(time.perf_counter() - started, 6), improve_gain=round(gain, 6))
+    assignments = improved
+    return assignments
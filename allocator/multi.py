@@ -0,0 +1,275 @@
+from typing import List, Tuple, Optional, Iterator, Set
+
+from allocator.blocks import BlockSet, Blocks
+from allocator.logic import ContainerMap, Deadline, SOLVER_settings, assign_containers, _scale_weights, _max_fit
+from allocator.telemetry import Telemetry, active, record
+
+
+def _subset_sum_best(weights: List[int], limit: int) -> int:
+    """Largest sum not above `limit` reachable by any subset, using a big-integer bitset."""
+    if limit < 0:
+        return 0
+    mask = (1 << (limit + 1)) - 1
+    reach = 1
+    for w in weights:
+        reach = (reach | (reach << w)) & mask
+    return reach.bit_length() - 1
+
+
+def _upper_bound(weights: List[int], capacity: int, count: int, max_blocks: Optional[int]) -> int:
+    """Bound on total load from surrogate and per-container relaxations.
+    `weights` must be sorted heaviest first."""
+    # Surrogate relaxation: one knapsack with the combined capacity of every container
+    bound = _subset_sum_best(weights, capacity * count)
+    # No container can be filled beyond the best single-container subset sum
+    bound = min(bound, _subset_sum_best(weights, capacity) * count)
+    # Only count * max_blocks blocks can be loaded, at best the heaviest ones
+    if max_blocks is not None:
+        bound = min(bound, sum(weights[:count * max_blocks]))
+    return bound
+
+
+def _best_fit_decreasing(weights: List[int], capacity: int, count: int,
+                         max_blocks: Optional[int]) -> Tuple[int, List[int]]:
+    """Place each block, heaviest first, into the open container it fills most tightly."""
+    loads = [0] * count
+    counts = [0] * count
+    placement = [-1] * len(weights)
+    for i, w in enumerate(weights):
+        best_c = -1
+        for c in range(count):
+            if loads[c] + w > capacity or (max_blocks is not None and counts[c] >= max_blocks):
+                continue
+            if best_c < 0 or loads[c] > loads[best_c]:
+                best_c = c
+        if best_c >= 0:
+            loads[best_c] += w
+            counts[best_c] += 1
+            placement[i] = best_c
+    return sum(loads), placement
+
+
+def _sequential_start(blocks: BlockSet, capacity: float, count: int, max_blocks: Optional[int],
+                      deadline: Deadline, precision: Optional[int], order: List[int],
+                      weights: List[int], capacity_scaled: int) -> Tuple[int, List[List[int]]]:
+    """The sequential allocation as a starting packing: (total load, positions in `order` per container).
+    Gives (-1, []) if it does not fit the scaled weights, as a greedy fill in tonnes may not."""
+    # Its own collector keeps the sequential solve's records out of the global strategy's
+    with Telemetry():
+        assignments = assign_containers(blocks, capacity, count, max_blocks, deadline=deadline, precision=precision)
+    position = {row: pos for pos, row in enumerate(order)}
+    containers = []
+    for info in assignments.values():
+        if any(row not in position for row in info['rows']):
+            return -1, []
+        positions = [position[row] for row in info['rows']]
+        if sum(weights[pos] for pos in positions) > capacity_scaled:
+            return -1, []
+        containers.append(positions)
+    return sum(weights[pos] for positions in containers for pos in positions), containers
+
+
+def _reach_layers(weights: List[int], capacity: int, max_blocks: int) -> List[List[int]]:
+    """layers[i][k] is a bitset of the sums reachable with exactly k of the first i blocks."""
+    mask = (1 << (capacity + 1)) - 1
+    layer = [1] + [0] * max_blocks
+    layers = [layer]
+    for w in weights:
+        shifted = [0] + [(bits << w) & mask for bits in layer[:-1]]
+        layer = [a | b for a, b in zip(layer, shifted)]
+        layers.append(layer)
+    return layers
+
+
+def _equal_runs(weights: List[int]) -> List[Tuple[int, int]]:
+    """(start, end) of each run of equal weights in a sorted list."""
+    runs = []
+    start = 0
+    for i in range(1, len(weights) + 1):
+        if i == len(weights) or weights[i] != weights[start]:
+            runs.append((start, i))
+            start = i
+    return runs
+
+
+def _distinct_subsets(layers: List[List[int]], weights: List[int], runs: List[Tuple[int, int]],
+                      load: int, count: int) -> Iterator[List[int]]:
+    """Positions of every subset of `count` blocks summing to `load`, one per multiset of weights.
+    Equal weights are interchangeable, so each run of them only decides how many to take
+    (its first ones). The reach layers prune every choice that cannot be completed."""
+    stack = [(len(runs), load, count, [])]
+    while stack:
+        run, rest, k, chosen = stack.pop()
+        if run == 0:
+            yield chosen
+            continue
+        start, end = runs[run - 1]
+        w = weights[start]
+        options = []
+        for c in range(min(end - start, k) + 1):
+            if rest - c * w < 0:
+                break
+            if (layers[start][k - c] >> (rest - c * w)) & 1:
+                options.append((run - 1, rest - c * w, k - c, chosen + list(range(start, start + c))))
+        # Fewest of the lighter blocks first, as the heavier ones are listed first
+        stack.extend(reversed(options))
+
+
+class _GlobalSearch:
+    """Branch and bound that fills one container per level.
+    Every subset a container can take is a branch, heaviest load first, with subsets that only
+    differ in which of some equal weights they use counted once. Containers are identical, so
+    loads are kept non-increasing from one container to the next and each node is bounded by a
+    surrogate subset-sum over the blocks still unassigned. The blocks left over decide the value
+    of a node and everything below it, so a node reached again with the same ones is skipped."""
+
+    def __init__(self, weights: List[int], capacity: int, count: int, max_blocks: Optional[int],
+                 upper_bound: int, deadline: Deadline) -> None:
+        self.weights = weights
+        self.capacity = capacity
+        self.count = count
+        # No container can hold more blocks than the lightest ones that fit
+        self.max_blocks = min(max_blocks if max_blocks is not None else len(weights), _max_fit(weights, capacity))
+        self.upper_bound = upper_bound
+        self.deadline = deadline
+
+        self.filled: List[List[int]] = []
+        self.best_value = -1
+        self.best_containers: List[List[int]] = []
+        self.nodes = 0
+        self.stopped = False
+        # (weights still unassigned, containers left, load limit) of every node searched
+        self.seen: Set[Tuple[Tuple[int, ...], int, int]] = set()
+
+    def run(self, incumbent_value: int, incumbent_containers: List[List[int]]) -> bool:
+        """Search for a better packing. Returns True when the result is proven optimal."""
+        self.best_value = incumbent_value
+        self.best_containers = [list(c) for c in incumbent_containers]
+        if self.best_value < self.upper_bound:
+            self._search(list(range(len(self.weights))), 0, self.capacity)
+        return not self.stopped or self.best_value >= self.upper_bound
+
+    def _record(self, value: int) -> None:
+        if value > self.best_value:
+            self.best_value = value
+            self.best_containers = [list(c) for c in self.filled]
+            if value >= self.upper_bound:
+                self.stopped = True
+
+    def _bound(self, weights: List[int], containers: int, capacity: int) -> int:
+        """Most weight `containers` containers of at most `capacity` could still take."""
+        bound = _subset_sum_best(weights, capacity * containers)
+        bound = min(bound, _subset_sum_best(weights, capacity) * containers)
+        return min(bound, sum(weights[:containers * self.max_blocks]))
+
+    def _search(self, items: List[int], value: int, load_limit: int) -> None:
+        self.nodes += 1
+        if self.deadline.expired():
+            self.stopped = True
+            return
+
+        level = len(self.filled)
+        containers_left = self.count - level
+        weights = [self.weights[p] for p in items]
+        if containers_left == 0 or not items:
+            self._record(value)
+            return
+        if value + self._bound(weights, containers_left, load_limit) <= self.best_value:
+            return
+
+        layers = _reach_layers(weights, load_limit, self.max_blocks)
+        loads = 0
+        for bits in layers[-1][1:]:
+            loads |= bits
+
+        if loads == 0:
+            self._record(value)
+            return
+
+        runs = _equal_runs(weights)
+        for load in range(loads.bit_length() - 1, 0, -1):
+            # Later containers carry no more than this one
+            if value + load * containers_left <= self.best_value:
+                break
+            if not (loads >> load) & 1:
+                continue
+
+            for k in range(1, len(layers[-1])):
+                if not (layers[-1][k] >> load) & 1:
+                    continue
+                for chosen in _distinct_subsets(layers, weights, runs, load, k):
+                    taken = set(chosen)
+                    rest = [p for i, p in enumerate(items) if i not in taken]
+                    key = (tuple(self.weights[p] for p in rest), containers_left - 1, load)
+                    if key in self.seen:
+                        continue
+                    self.seen.add(key)
+                    self.filled.append([items[i] for i in chosen])
+                    self._search(rest, value + load, load)
+                    self.filled.pop()
+                    # Any subset with the heaviest load does for the last container
+                    if self.stopped or containers_left == 1:
+                        return
+
+
+def assign_containers_global(blocks: Blocks, capacity: float, count: int, max_blocks: int = None,
+                             time_budget: Optional[float] = None,
+                             deadline: Optional[Deadline] = None, precision: int = None) -> ContainerMap:
+    """Pack blocks into `count` identical containers, maximising the total loaded weight.
+    All containers are optimised together by branch and bound, starting from the better of a
+    best-fit-decreasing packing and the sequential allocation, so the result is never worse than either."""
+    # Input validation
+    if capacity <= 0:
+        raise ValueError("Container capacity must be greater than 0")
+    if count <= 0:
+        raise ValueError("Number of containers must be greater than 0")
+
+    blocks = BlockSet.from_blocks(blocks)
+    if time_budget is None:
+        time_budget = SOLVER_settings.ALLOCATION_TIME_LIMIT
+    deadline = Deadline(time_budget, parent=deadline)
+
+    scaled, capacity_scaled = _scale_weights(blocks, capacity, precision)
+    if max_blocks is not None and max_blocks <= 0:
+        order = []
+    else:
+        # Heaviest first, dropping blocks that fit no container
+        order = sorted((i for i in range(len(blocks)) if scaled[i] <= capacity_scaled),
+                       key=lambda i: -scaled[i])
+    weights = [scaled[i] for i in order]
+
+    upper_bound = _upper_bound(weights, capacity_scaled, count, max_blocks)
+    incumbent_value, incumbent_placement = _best_fit_decreasing(weights, capacity_scaled, count, max_blocks)
+    incumbent = [[pos for pos, c in enumerate(incumbent_placement) if c == cid] for cid in range(count)]
+    start = 'best_fit'
+    if incumbent_value < upper_bound:
+        sequential_value, sequential = _sequential_start(blocks, capacity, count, max_blocks, deadline, precision,
+                                                         order, weights, capacity_scaled)
+        if sequential_value > incumbent_value:
+            incumbent_value, incumbent, start = sequential_value, sequential, 'sequential'
+    search = _GlobalSearch(weights, capacity_scaled, count, max_blocks, upper_bound, deadline)
+    optimal = search.run(incumbent_value, incumbent)
+    record(engine='global', start=start, nodes=search.nodes, optimal=optimal, timed_out=not optimal)
+
+    containers: List[List[int]] = [[order[pos] for pos in positions] for positions in search.best_containers]
+    containers += [[] for _ in range(count - len(containers))]
+
+    # Heaviest containers first, like the sequential allocation
+    containers.sort(key=lambda rows: -blocks.total_weight(rows))
+    unplaced = len(blocks) - sum(len(rows) for rows in containers)
+
+    recorder = active()
+    assignments: ContainerMap = {}
+    for cid, rows in enumerate(containers, start=1):
+        if not rows and not unplaced:
+            break
+        assignments[cid] = {
+            'blocks': blocks.block_no[rows].tolist(),
+            'total_weight': blocks.total_weight(rows),
+            'optimal': optimal,
+            'rows': rows
+        }
+        if recorder is not None:
+            recorder.container(cid, engine='global', optimal=optimal, blocks=len(rows),
+                               fill=round(assignments[cid]['total_weight'] / capacity, 6))
+    return assignments
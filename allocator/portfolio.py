@@ -0,0 +1,154 @@
+from typing import List, Tuple, Dict, Callable, Optional, Sequence
+from concurrent.futures import ProcessPoolExecutor, Executor, FIRST_COMPLETED, wait
+
+from allocator.blocks import BlockSet, Blocks, dBlock
+from allocator.logic import (
+    Deadline, SOLVER_settings,
+    _dp_select, _greedy_select, _group_pieces, _grouped_select, _local_select, _max_fit, _mitm_select, _scale_weights,
+)
+from allocator.telemetry import record
+
+SubsetResult = Tuple[List[dBlock], float, bool]
+Selection = Tuple[List[int], bool]
+
+
+def _solve_dp(blocks: BlockSet, capacity: float, max_blocks: Optional[int], deadline: Deadline,
+              precision: Optional[int]) -> Selection:
+    # The DP engine itself, so it does not repeat the meet-in-the-middle strategy's work
+    scaled, capacity_scaled = _scale_weights(blocks, capacity, precision)
+    limit = min(len(blocks), max_blocks) if max_blocks is not None else len(blocks)
+    limit = min(limit, _max_fit(scaled, capacity_scaled))
+    if limit <= 0:
+        return [], True
+    items = len(blocks)
+    if SOLVER_settings.GROUP_EQUAL_WEIGHTS:
+        items = min(items, len(_group_pieces(scaled, capacity_scaled, limit)[1]))
+    if items * (capacity_scaled + 1) * (limit + 1) > SOLVER_settings.DP_MAX_CELLS:
+        # Too large to solve exactly, leave it to the other strategies
+        return [], False
+    if items < len(blocks):
+        return _grouped_select(scaled, capacity_scaled, limit, deadline)
+    return _dp_select(blocks.weight, scaled, capacity_scaled, limit, deadline)
+
+
+def _solve_greedy(blocks: BlockSet, capacity: float, max_blocks: Optional[int], deadline: Deadline,
+                  precision: Optional[int]) -> Selection:
+    return _greedy_select(blocks, capacity, max_blocks), False
+
+
+def _solve_mitm(blocks: BlockSet, capacity: float, max_blocks: Optional[int], deadline: Deadline,
+                precision: Optional[int]) -> Selection:
+    # Only exact (and fast) for mid-sized inputs, otherwise leave it to the other strategies
+    if len(blocks) > SOLVER_settings.MITM_MAX_BLOCKS:
+        return [], False
+    scaled, capacity_scaled = _scale_weights(blocks, capacity, precision)
+    limit = min(len(blocks), max_blocks) if max_blocks is not None else len(blocks)
+    return _mitm_select(scaled, capacity_scaled, limit, deadline)
+
+
+def _solve_local(blocks: BlockSet, capacity: float, max_blocks: Optional[int], deadline: Deadline,
+                 precision: Optional[int]) -> Selection:
+    return _local_select(blocks, capacity, max_blocks, deadline, precision), False
+
+
+# Strategies a portfolio can run, by name
+STRATEGIES: Dict[str, Callable[[BlockSet, float, Optional[int], Deadline, Optional[int]], Selection]] = {
+    'dp': _solve_dp,
+    'greedy': _solve_greedy,
+    'mitm': _solve_mitm,
+    'local': _solve_local,
+}
+
+
+def _run_strategy(name: str, blocks: BlockSet, capacity: float, max_blocks: Optional[int],
+                  time_budget: Optional[float], precision: Optional[int]) -> Selection:
+    """Worker entry point: run one strategy under its own deadline."""
+    return STRATEGIES[name](blocks, capacity, max_blocks, Deadline(time_budget), precision)
+
+
+class SolverPortfolio:
+    """Runs several single-container strategies at once on a process pool and keeps the best answer.
+    Workers enforce their own deadline, so once a strategy proves optimality the others are
+    abandoned rather than waited for. Pass an existing executor to reuse warm worker processes."""
+
+    def __init__(self, strategies: Optional[Sequence[str]] = None, max_workers: Optional[int] = None,
+                 executor: Optional[Executor] = None) -> None:
+        self.strategies = list(strategies) if strategies is not None else list(STRATEGIES)
+        for name in self.strategies:
+            if name not in STRATEGIES:
+                raise ValueError(f"Unknown solver strategy '{name}'")
+        self._owns_executor = executor is None
+        self.executor = executor if executor is not None else ProcessPoolExecutor(
+            max_workers=max_workers or len(self.strategies)
+        )
+
+    def select(self, blocks: Blocks, capacity: float, max_blocks: int = None,
+               time_budget: Optional[float] = None, deadline: Optional[Deadline] = None,
+               precision: int = None) -> Selection:
+        """Same contract as select_best_subset: (positions, optimal)."""
+        if not len(blocks) or capacity <= 0:
+            return [], True
+        blocks = BlockSet.from_blocks(blocks)
+        if time_budget is None:
+            time_budget = SOLVER_settings.DP_TIME_LIMIT
+        deadline = Deadline(time_budget, parent=deadline)
+
+        def weight(selection: Selection) -> float:
+            return blocks.total_weight(selection[0])
+
+        # Always have an answer, even if the workers are slow to start
+        best = _solve_greedy(blocks, capacity, max_blocks, deadline, precision)
+        best_name = 'greedy'
+
+        errors: Dict[str, str] = {}
+        pending = {
+            self.executor.submit(_run_strategy, name, blocks, capacity, max_blocks, deadline.remaining(),
+                                 precision): name
+            for name in self.strategies
+        }
+        while pending and not deadline.expired():
+            done, _ = wait(pending, timeout=deadline.remaining(), return_when=FIRST_COMPLETED)
+            for future in done:
+                name = pending.pop(future)
+                if future.exception() is not None:
+                    errors[name] = repr(future.exception())
+                    continue
+                result = future.result()
+                # Heavier wins; on equal weight a proven optimum wins
+                if weight(result) > weight(best) or (weight(result) == weight(best) and result[1]):
+                    best, best_name = result, name
+            if best[1]:
+                break
+
+        for future in pending:
+            future.cancel()
+        record(engine=f'portfolio/{best_name}', timed_out=not best[1])
+        if errors:
+            record(portfolio_errors=errors)
+        return best
+
+    def solve(self, blocks: Blocks, capacity: float, max_blocks: int = None,
+              time_budget: Optional[float] = None, deadline: Optional[Deadline] = None,
+              precision: int = None) -> SubsetResult:
+        """Same contract as find_best_subset_anytime: (subset, total weight, optimal)."""
+        blocks = BlockSet.from_blocks(blocks)
+        positions, optimal = self.select(blocks, capacity, max_blocks, time_budget, deadline, precision)
+        return [blocks[i] for i in positions], blocks.total_weight(positions), optimal
+
+    def close(self) -> None:
+        if self._owns_executor:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def __enter__(self) -> 'SolverPortfolio':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def find_best_subset_portfolio(blocks: BlockSet, capacity: float, max_blocks: int = None,
+                               time_budget: Optional[float] = None,
+                               strategies: Optional[Sequence[str]] = None, precision: int = None) -> SubsetResult:
+    """One-off portfolio solve. For repeated solves keep a SolverPortfolio open instead."""
+    with SolverPortfolio(strategies) as portfolio:
+        return portfolio.solve(blocks, capacity, max_blocks, time_budget, precision=precision)
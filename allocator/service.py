@@ -0,0 +1,356 @@
+from typing import List, Dict, Optional, Any
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError as FutureTimeout, wait
+from contextlib import ExitStack
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import argparse
+import importlib
+import json
+import math
+import os
+import signal
+import socketserver
+import sys
+import threading
+import time
+
+import numpy as np
+
+from allocator.blocks import BlockSet, SIZE_COLUMNS, block_labels, block_set
+from allocator.cli import build_plan
+from allocator.improve import improve_assignments
+from allocator.logic import load_blocks, assign_containers, select_best_subset, SOLVER_settings
+from allocator.portfolio import SolverPortfolio
+from allocator.telemetry import Telemetry
+
+
+class SERVICE_settings:
+    HOST: str = '127.0.0.1'  # Local clients only
+    PORT: int = 8765
+    QUEUE_SIZE: int = 16  # Requests that may wait for a worker before new ones are turned away
+    MAX_BODY_BYTES: int = 64 * 1024 * 1024  # Largest request accepted
+    DEADLINE_GRACE: float = 2.0  # Seconds past a request's deadline before the client is answered 504
+
+
+class ServiceBusy(Exception):
+    """Every worker is busy and the queue is full."""
+
+
+def _warm_up() -> None:
+    """Worker initializer: pay for the pandas import and the first solves before any request arrives."""
+    # Ctrl-C reaches the whole process group; the server shuts the workers down itself
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    importlib.import_module('pandas')
+    blocks = BlockSet(np.arange(4, dtype=np.int64), np.array([10.5, 12.25, 13.0, 15.75]))
+    select_best_subset(blocks, 26.0)
+    select_best_subset(blocks, 26.0, 2)
+
+
+def _ready() -> bool:
+    return True
+
+
+def _parse_request(request: Any) -> Dict[str, Any]:
+    """Check an allocation request and fill in defaults. Raises ValueError on a bad request."""
+    if not isinstance(request, dict):
+        raise ValueError("The request must be a JSON object")
+    if ('path' in request) == ('blocks' in request):
+        raise ValueError("Give either 'path' (a CSV file) or 'blocks'")
+    if 'path' in request and not isinstance(request['path'], str):
+        raise ValueError("'path' must be a string")
+    if 'blocks' in request and not isinstance(request['blocks'], list):
+        raise ValueError("'blocks' must be a list of [BlockNo, Weight] pairs or of records")
+
+    capacity = request.get('capacity')
+    if isinstance(capacity, list):
+        if not capacity or not all(isinstance(c, (int, float)) for c in capacity):
+            raise ValueError("'capacity' must be a number or a list of numbers")
+        count = request.get('count', len(capacity))
+    elif isinstance(capacity, (int, float)) and not isinstance(capacity, bool):
+        count = request.get('count')
+        if count is None:
+            raise ValueError("'count' is required with a single capacity")
+    else:
+        raise ValueError("'capacity' must be a number or a list of numbers")
+    if not isinstance(count, int) or isinstance(count, bool):
+        raise ValueError("'count' must be a whole number")
+    max_blocks = request.get('max_blocks')
+    if max_blocks is not None and (not isinstance(max_blocks, int) or isinstance(max_blocks, bool)):
+        raise ValueError("'max_blocks' must be a whole number")
+    precision = request.get('precision')
+    if precision is not None and (not isinstance(precision, int) or isinstance(precision, bool) or precision < 0):
+        raise ValueError("'precision' must be a whole number of decimal places")
+    volume = request.get('volume')
+    if volume is not None and (not isinstance(volume, (int, float)) or isinstance(volume, bool) or volume <= 0):
+        raise ValueError("'volume' must be a positive number")
+
+    deadline = request.get('deadline', SOLVER_settings.ALLOCATION_TIME_LIMIT)
+    if not isinstance(deadline, (int, float)) or deadline <= 0:
+        raise ValueError("'deadline' must be a positive number of seconds")
+    dimensions = request.get('dimensions')
+    if dimensions is not None and (not isinstance(dimensions, list) or len(dimensions) != 3):
+        raise ValueError("'dimensions' must be [L, H, W]")
+    solver = request.get('solver', 'auto')
+    if solver not in ('auto', 'portfolio'):
+        raise ValueError("'solver' must be 'auto' or 'portfolio'")
+    if solver == 'portfolio' and volume is not None:
+        raise ValueError("The portfolio solver does not take a volume limit")
+
+    return {
+        'path': request.get('path'),
+        'blocks': request.get('blocks'),
+        'capacity': capacity,
+        'count': count,
+        'max_blocks': max_blocks,
+        'strategy': request.get('strategy', 'sequential'),
+        'solver': solver,
+        'precision': precision,
+        'volume': volume,
+        'dimensions': tuple(dimensions) if dimensions is not None else None,
+        'improve': bool(request.get('improve', False)),
+        'telemetry': bool(request.get('telemetry', False)),
+        'deadline': float(deadline),
+    }
+
+
+def _is_label(value: Any) -> bool:
+    """Whether a JSON value can be a BlockNo: a finite number or non-blank text."""
+    if isinstance(value, str):
+        return value.strip() != ''
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+
+def _size(value: Any) -> float:
+    """A size field as a number, or NaN when it is missing or not a number."""
+    if isinstance(value, bool):
+        return math.nan
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+def _request_blocks(records: List[Any]) -> BlockSet:
+    """Blocks sent inline, as [BlockNo, Weight] pairs or records with BlockNo, Weight and optional sizes."""
+    if records and isinstance(records[0], dict):
+        try:
+            labels = [r['BlockNo'] for r in records]
+            values = {'Weight': np.array([r['Weight'] for r in records], dtype=np.float64)}
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"Invalid block record: {e}")
+        # Sizes are only needed by a volume or dimension limit, which rejects the missing ones
+        for col in SIZE_COLUMNS:
+            if col in records[0]:
+                values[col] = np.array([_size(r.get(col)) for r in records], dtype=np.float64)
+    else:
+        if not all(isinstance(pair, list) and len(pair) == 2 for pair in records):
+            raise ValueError("Blocks must be [BlockNo, Weight] pairs")
+        labels = [pair[0] for pair in records]
+        try:
+            values = {'Weight': np.array([pair[1] for pair in records], dtype=np.float64)}
+        except (TypeError, ValueError):
+            raise ValueError("Blocks must be [BlockNo, Weight] pairs")
+
+    if not all(_is_label(label) for label in labels):
+        raise ValueError("Every BlockNo must be a number or a label")
+    if np.isnan(values['Weight']).any() or (values['Weight'] < 0).any():
+        raise ValueError("Every Weight must be a non-negative number")
+    values['BlockNo'] = block_labels(labels)
+    return block_set(values)
+
+
+def allocate_request(request: Dict[str, Any]) -> Dict[str, Any]:
+    """Worker entry point: load the blocks of a parsed request and allocate them within its deadline,
+    which counts from when the request was queued."""
+    started = time.perf_counter()
+    time_budget = request['expires_at'] - time.time()
+    if time_budget <= 0:
+        raise TimeoutError("The deadline passed while the request was queued")
+    blocks = load_blocks(request['path']) if request['path'] is not None else _request_blocks(request['blocks'])
+    telemetry = Telemetry() if request['telemetry'] else None
+    with ExitStack() as stack:
+        # A portfolio's processes must be shut down before the worker exits, so each request gets its
+        # own; they are forked from this already warm worker
+        solver = stack.enter_context(SolverPortfolio()).select if request['solver'] == 'portfolio' else None
+        assignments = assign_containers(
+            blocks, request['capacity'], request['count'], request['max_blocks'], time_budget=time_budget,
+            strategy=request['strategy'], solver=solver, precision=request['precision'], volume=request['volume'],
+            dimensions=request['dimensions'], improver=improve_assignments if request['improve'] else None,
+            telemetry=telemetry
+        )
+    plan = build_plan(request['path'] or '<request>', blocks, assignments, request['capacity'], request['count'],
+                      request['max_blocks'])
+    plan['status'] = 'ok'
+    if telemetry is not None:
+        plan['telemetry'] = telemetry.to_dict()
+    plan['elapsed'] = round(time.perf_counter() - started, 4)
+    return plan
+
+
+class AllocationService:
+    """Allocates requests on a pool of worker processes that are warmed up before the first one.
+    At most `workers` requests run at once and `queue_size` more may wait; beyond that submit()
+    raises ServiceBusy. Each request's deadline is the time budget of its allocation."""
+
+    def __init__(self, workers: Optional[int] = None, queue_size: Optional[int] = None) -> None:
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_size = queue_size if queue_size is not None else SERVICE_settings.QUEUE_SIZE
+        self._slots = threading.BoundedSemaphore(self.workers + self.queue_size)
+        self._pending = 0
+        self._lock = threading.Lock()
+        self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_warm_up)
+
+    def warm(self) -> None:
+        """Start every worker now, so the first requests do not wait for imports."""
+        wait([self.executor.submit(_ready) for _ in range(self.workers)])
+
+    @property
+    def pending(self) -> int:
+        """Requests running or waiting for a worker."""
+        return self._pending
+
+    def submit(self, request: Dict[str, Any]) -> Future:
+        """Queue a parsed request. Raises ServiceBusy when the queue is full."""
+        if not self._slots.acquire(blocking=False):
+            raise ServiceBusy(f"{self.workers} workers busy and {self.queue_size} requests queued")
+        # Wall-clock, as the worker is another process
+        request = dict(request, expires_at=time.time() + request['deadline'])
+        with self._lock:
+            self._pending += 1
+        try:
+            future = self.executor.submit(allocate_request, request)
+        except Exception:
+            self._release()
+            raise
+        # The slot is held until the worker is really done, even if the client gave up
+        future.add_done_callback(lambda _: self._release())
+        return future
+
+    def _release(self) -> None:
+        with self._lock:
+            self._pending -= 1
+        self._slots.release()
+
+    def allocate(self, request: Any) -> Dict[str, Any]:
+        """Parse, queue and wait for one request. Raises ValueError for a bad request,
+        ServiceBusy when the queue is full and TimeoutError when the deadline is well past."""
+        request = _parse_request(request)
+        future = self.submit(request)
+        try:
+            return future.result(timeout=request['deadline'] + SERVICE_settings.DEADLINE_GRACE)
+        except FutureTimeout:
+            future.cancel()
+            raise TimeoutError(f"No answer within the {request['deadline']:g} s deadline")
+
+    def close(self) -> None:
+        """Drop queued requests and wait for the running ones, which their deadlines bound."""
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+    def __enter__(self) -> 'AllocationService':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """GET /health reports the pool; POST /allocate takes a JSON request and answers with the plan."""
+
+    service: AllocationService = None
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self) -> None:
+        if self.path != '/health':
+            self._reply(404, {'error': f"Unknown endpoint {self.path}"})
+            return
+        self._reply(200, {'status': 'ok', 'workers': self.service.workers, 'pending': self.service.pending,
+                          'queue_size': self.service.queue_size})
+
+    def do_POST(self) -> None:
+        if self.path != '/allocate':
+            self._reply(404, {'error': f"Unknown endpoint {self.path}"})
+            return
+        length = int(self.headers.get('Content-Length') or 0)
+        if length > SERVICE_settings.MAX_BODY_BYTES:
+            self.close_connection = True
+            self._reply(413, {'error': "Request too large"})
+            return
+        try:
+            request = json.loads(self.rfile.read(length) or b'null')
+        except (json.JSONDecodeError, UnicodeDecodeError) as e:
+            self._reply(400, {'error': f"Invalid JSON: {e}"})
+            return
+
+        try:
+            self._reply(200, self.service.allocate(request))
+        except ValueError as e:
+            self._reply(400, {'status': 'error', 'error': str(e)})
+        except ServiceBusy as e:
+            self._reply(503, {'status': 'error', 'error': str(e)})
+        except TimeoutError as e:
+            self._reply(504, {'status': 'error', 'error': str(e)})
+        except Exception as e:
+            self._reply(500, {'status': 'error', 'error': str(e)})
+
+    def _reply(self, status: int, body: Dict[str, Any]) -> None:
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def address_string(self) -> str:
+        # Unix socket clients have no address
+        return self.client_address[0] if isinstance(self.client_address, tuple) else 'local'
+
+
+class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def make_server(service: AllocationService, host: str = None, port: int = None,
+                socket_path: Optional[str] = None) -> socketserver.BaseServer:
+    """An HTTP server for `service` on host:port (localhost by default) or on a Unix socket."""
+    handler = type('Handler', (_Handler,), {'service': service})
+    if socket_path is not None:
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        return _UnixHTTPServer(socket_path, handler)
+    return ThreadingHTTPServer((host or SERVICE_settings.HOST, port if port is not None else SERVICE_settings.PORT),
+                               handler)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog='BlockAllocator serve',
+        description="Serve allocations over HTTP/JSON to local clients: POST /allocate, GET /health."
+    )
+    parser.add_argument('--host', default=SERVICE_settings.HOST)
+    parser.add_argument('--port', type=int, default=SERVICE_settings.PORT)
+    parser.add_argument('--socket', default=None, metavar='PATH', help="Listen on a Unix socket instead")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: one per CPU)")
+    parser.add_argument('--queue', type=int, default=None,
+                        help=f"Requests that may wait for a worker (default: {SERVICE_settings.QUEUE_SIZE})")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    with AllocationService(args.workers, args.queue) as service:
+        service.warm()
+        server = make_server(service, args.host, args.port, args.socket)
+        where = args.socket if args.socket is not None else f"http://{args.host}:{server.server_address[1]}"
+        print(f"Serving allocations on {where} with {service.workers} workers", file=sys.stderr)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            if args.socket is not None and os.path.exists(args.socket):
+                os.unlink(args.socket)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
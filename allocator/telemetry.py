@@ -0,0 +1,89 @@
+from typing import Dict, Any, Optional
+import json
+import threading
+import time
+
+# The collector receiving hooks on this thread, if any
+_active = threading.local()
+
+
+class Telemetry:
+    """Collects what an allocation did: per container the engine that answered, wall time,
+    DP cells and table bytes, search nodes, whether it was proven optimal or cut short, and fill.
+    Pass one to assign_containers; the engines report through record() and tally(), which do
+    nothing unless a collector is active on the calling thread."""
+
+    def __init__(self) -> None:
+        self.allocation: Dict[str, Any] = {}
+        self.containers: Dict[int, Dict[str, Any]] = {}
+        self._record = self.allocation
+        self._started = 0.0
+        self._container_started: Optional[float] = None
+        self._previous: Optional['Telemetry'] = None
+
+    def start_container(self, cid: int) -> None:
+        """Send hooks to container `cid`'s record until finish_container()."""
+        self._record = self.containers.setdefault(cid, {})
+        self._container_started = time.perf_counter()
+
+    def finish_container(self, **fields: Any) -> None:
+        if self._container_started is not None:
+            self._record['time'] = round(time.perf_counter() - self._container_started, 6)
+        self._record.update(fields)
+        self._record = self.allocation
+        self._container_started = None
+
+    def container(self, cid: int, **fields: Any) -> None:
+        """Set fields on container `cid`'s record directly, for solvers that fill every container at once."""
+        self.containers.setdefault(cid, {}).update(fields)
+
+    def record(self, **fields: Any) -> None:
+        self._record.update(fields)
+
+    def tally(self, key: str, amount: int = 1) -> None:
+        self._record[key] = self._record.get(key, 0) + amount
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'allocation': dict(self.allocation),
+            'containers': {str(cid): dict(info) for cid, info in sorted(self.containers.items())},
+        }
+
+    def to_json(self, path: Optional[str] = None) -> str:
+        """The telemetry as JSON, also written to `path` when given."""
+        text = json.dumps(self.to_dict(), indent=2)
+        if path is not None:
+            with open(path, 'w') as f:
+                f.write(text)
+        return text
+
+    def __enter__(self) -> 'Telemetry':
+        self._previous = getattr(_active, 'telemetry', None)
+        _active.telemetry = self
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.allocation['time'] = round(time.perf_counter() - self._started, 6)
+        self._record = self.allocation
+        _active.telemetry = self._previous
+        self._previous = None
+
+
+def active() -> Optional[Telemetry]:
+    """The collector active on this thread, or None."""
+    return getattr(_active, 'telemetry', None)
+
+
+def record(**fields: Any) -> None:
+    """Set fields on the current record, if a collector is active."""
+    telemetry = getattr(_active, 'telemetry', None)
+    if telemetry is not None:
+        telemetry.record(**fields)
+
+
+def tally(key: str, amount: int = 1) -> None:
+    """Add to a counter on the current record, if a collector is active."""
+    telemetry = getattr(_active, 'telemetry', None)
+    if telemetry is not None:
+        telemetry.tally(key, amount)
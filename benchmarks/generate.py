@@ -0,0 +1,69 @@
+from typing import Tuple, Optional
+
+import numpy as np
+
+from allocator.blocks import BlockSet
+
+
+class GENERATOR_settings:
+    # Fitted to the example manifests: sizes in cm, Volume in m3, density in t/m3
+    LENGTH: Tuple[float, float, float, float] = (220.0, 35.0, 140.0, 300.0)  # Mean, spread, min, max
+    HEIGHT: Tuple[float, float, float, float] = (160.0, 25.0, 80.0, 200.0)
+    WIDTH: Tuple[float, float, float, float] = (123.0, 36.0, 70.0, 240.0)
+    DENSITY: Tuple[float, float, float, float] = (3.73, 0.32, 3.25, 5.1)
+    SIZE_STEP: float = 5.0  # Quarry blocks are measured to the nearest 5 cm
+    WEIGHT_RANGE: Tuple[float, float] = (8.0, 26.0)  # Lightest and heaviest block weights seen
+    PLANT_ATTEMPTS: int = 1000  # Draws tried before a fill is declared impossible to plant
+
+
+def _draw(rng: np.random.Generator, spec: Tuple[float, float, float, float], n: int) -> np.ndarray:
+    mean, spread, low, high = spec
+    return np.clip(rng.normal(mean, spread, n), low, high)
+
+
+def generate_blocks(n: int, precision: int = 1, seed: int = 0) -> BlockSet:
+    """Random manifest of `n` blocks shaped like the real ones, weights to `precision` decimals.
+    Dimensions are drawn first and the weight follows from Volume x density."""
+    rng = np.random.default_rng(seed)
+    step = GENERATOR_settings.SIZE_STEP
+    dims = np.column_stack([
+        np.round(_draw(rng, spec, n) / step) * step
+        for spec in (GENERATOR_settings.LENGTH, GENERATOR_settings.HEIGHT, GENERATOR_settings.WIDTH)
+    ])
+    volume = np.round(dims.prod(axis=1) / 1e6, 2)
+    weight = np.clip(volume * _draw(rng, GENERATOR_settings.DENSITY, n), *GENERATOR_settings.WEIGHT_RANGE)
+    block_no = np.arange(1, n + 1, dtype=np.int64) + 6000
+    return BlockSet(block_no, np.round(weight, precision), volume, dims)
+
+
+def planted_manifest(n: int, capacity: float, count: int = 1, max_blocks: Optional[int] = None,
+                     precision: int = 1, seed: int = 0) -> Tuple[BlockSet, float]:
+    """A generated manifest with a known optimum: `count` groups of blocks that each fill `capacity`
+    exactly (within `max_blocks`) are hidden among random ones. Returns (blocks, optimum total weight)."""
+    rng = np.random.default_rng(seed + 1)
+    blocks = generate_blocks(n, precision, seed)
+    scale = 10 ** precision
+    capacity_units = int(round(capacity * scale))
+    low, high = (int(round(w * scale)) for w in GENERATOR_settings.WEIGHT_RANGE)
+    weights = np.rint(blocks.weight * scale).astype(np.int64)
+
+    # About as many blocks as a real container takes, then the last one makes up the rest
+    per_container = max(1, int(round(capacity / weights.mean() * scale)))
+    if max_blocks is not None:
+        per_container = min(per_container, max_blocks)
+    if per_container * count > n:
+        raise ValueError(f"{n} blocks are too few to plant {count} full containers")
+
+    rows = rng.permutation(n)[:per_container * count].reshape(count, per_container)
+    for group in rows:
+        for _ in range(GENERATOR_settings.PLANT_ATTEMPTS):
+            rest = capacity_units - int(weights[group[:-1]].sum())
+            if low <= rest <= high:
+                break
+            weights[group[:-1]] = rng.integers(low, high + 1, per_container - 1)
+        else:
+            raise ValueError(f"Cannot plant an exact {capacity} t fill with {per_container} blocks")
+        weights[group[-1]] = rest
+
+    planted = BlockSet(blocks.block_no, weights / scale, blocks.volume, blocks.dims)
+    return planted, capacity_units * count / scale
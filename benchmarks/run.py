@@ -0,0 +1,186 @@
+from typing import List, Dict, Optional, Any, Callable
+import argparse
+import itertools
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from allocator.blocks import BlockSet
+from allocator.logic import find_best_subset_dp, find_best_subset_bitset, find_best_subset_greedy, assign_containers
+from benchmarks.generate import planted_manifest
+
+
+class BENCH_settings:
+    REPEATS: int = 3  # Timed runs per case; the fastest is recorded
+    TIME_TOLERANCE: float = 1.5  # A case regresses when it is this many times slower than the baseline
+    TIME_FLOOR: float = 0.005  # Seconds of slowdown ignored as timer noise
+    MEMORY_TOLERANCE: float = 1.25  # Same for peak memory
+    MEMORY_FLOOR: int = 64 * 1024  # Bytes of extra peak memory ignored
+
+
+# Parameters swept per solver; every combination is one case
+SWEEP: Dict[str, Dict[str, List[Any]]] = {
+    'dp': {'blocks': [50, 500, 5000], 'capacity': [26.0, 52.0], 'precision': [1, 2],
+           'max_blocks': [None, 3], 'count': [1]},
+    'bitset': {'blocks': [50, 5000, 100000], 'capacity': [26.0, 52.0], 'precision': [1, 2],
+               'max_blocks': [None], 'count': [1]},
+    'greedy': {'blocks': [20, 1000, 100000], 'capacity': [26.0, 52.0], 'precision': [2],
+               'max_blocks': [None, 3], 'count': [1]},
+    'assign': {'blocks': [40, 1000, 20000], 'capacity': [26.0], 'precision': [1, 2],
+               'max_blocks': [3], 'count': [4, 16]},
+}
+
+
+def _solver(name: str, case: Dict[str, Any]) -> Callable[[BlockSet], float]:
+    """The call a case measures, returning the weight it shipped."""
+    capacity, max_blocks, precision = case['capacity'], case['max_blocks'], case['precision']
+    if name == 'dp':
+        return lambda blocks: find_best_subset_dp(blocks, capacity, max_blocks, precision)[1]
+    if name == 'bitset':
+        return lambda blocks: find_best_subset_bitset(blocks, capacity, precision)[1]
+    if name == 'greedy':
+        return lambda blocks: find_best_subset_greedy(blocks, capacity, max_blocks)[1]
+    if name == 'assign':
+        return lambda blocks: sum(info['total_weight'] for info in assign_containers(
+            blocks, capacity, case['count'], max_blocks, precision=precision).values())
+    raise ValueError(f"Unknown solver '{name}'")
+
+
+def case_name(solver: str, case: Dict[str, Any]) -> str:
+    return (f"{solver}/n={case['blocks']}/capacity={case['capacity']:g}/precision={case['precision']}"
+            f"/max_blocks={case['max_blocks']}/count={case['count']}")
+
+
+def cases(solvers: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """Every (solver, parameters) combination in SWEEP, optionally for some solvers only."""
+    found = []
+    for solver, grid in SWEEP.items():
+        if solvers and solver not in solvers:
+            continue
+        keys = list(grid)
+        for values in itertools.product(*(grid[k] for k in keys)):
+            found.append({'solver': solver, **dict(zip(keys, values))})
+    return found
+
+
+def run_case(case: Dict[str, Any], repeats: int = None, seed: int = 0) -> Dict[str, Any]:
+    """Time one case (best of `repeats`), then rerun it under tracemalloc for peak memory.
+    Fill is the shipped weight as a fraction of the planted optimum."""
+    if repeats is None:
+        repeats = BENCH_settings.REPEATS
+    blocks, optimum = planted_manifest(case['blocks'], case['capacity'], case['count'], case['max_blocks'],
+                                       case['precision'], seed)
+    solve = _solver(case['solver'], case)
+
+    elapsed = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        shipped = solve(blocks)
+        elapsed.append(time.perf_counter() - started)
+
+    tracemalloc.start()
+    try:
+        solve(blocks)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'time': round(min(elapsed), 6),
+        'peak_memory': peak,
+        'shipped': round(shipped, 6),
+        'optimum': round(optimum, 6),
+        'fill': round(shipped / optimum, 6) if optimum else 1.0,
+    }
+
+
+def run_suite(solvers: Optional[List[str]] = None, repeats: int = None, seed: int = 0,
+              report: Optional[Callable[[str, Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+    """Run the sweep and return it as a baseline document."""
+    results = {}
+    for case in cases(solvers):
+        name = case_name(case['solver'], case)
+        results[name] = run_case(case, repeats, seed)
+        if report is not None:
+            report(name, results[name])
+    return {
+        'seed': seed,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'cases': results,
+    }
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], time_tolerance: float = None,
+            memory_tolerance: float = None) -> List[str]:
+    """Describe every case that got slower, used more memory or shipped less than in `baseline`."""
+    if time_tolerance is None:
+        time_tolerance = BENCH_settings.TIME_TOLERANCE
+    if memory_tolerance is None:
+        memory_tolerance = BENCH_settings.MEMORY_TOLERANCE
+    if baseline.get('seed') != current.get('seed'):
+        return [f"baseline was generated with seed {baseline.get('seed')}, not {current.get('seed')}"]
+
+    problems = []
+    for name, now in current['cases'].items():
+        before = baseline['cases'].get(name)
+        if before is None:
+            continue
+        if now['fill'] < before['fill'] - 1e-9:
+            problems.append(f"{name}: fill {now['fill']:.4f} < {before['fill']:.4f}")
+        if now['time'] > before['time'] * time_tolerance and now['time'] - before['time'] > BENCH_settings.TIME_FLOOR:
+            problems.append(f"{name}: {now['time']:.4f} s vs {before['time']:.4f} s")
+        if now['peak_memory'] > before['peak_memory'] * memory_tolerance \
+                and now['peak_memory'] - before['peak_memory'] > BENCH_settings.MEMORY_FLOOR:
+            problems.append(f"{name}: peak {now['peak_memory'] / 1024:.0f} KiB "
+                            f"vs {before['peak_memory'] / 1024:.0f} KiB")
+    return problems
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks.run',
+        description="Benchmark the solvers on seeded synthetic manifests with a known optimum.")
+    parser.add_argument('--solver', choices=sorted(SWEEP), action='append', default=None,
+                        help="Only benchmark this solver (repeatable; default: all)")
+    parser.add_argument('--repeats', type=int, default=None, help="Timed runs per case")
+    parser.add_argument('--seed', type=int, default=0, help="Seed for the generated manifests")
+    parser.add_argument('--save', default=None, metavar='PATH', help="Write the results as a baseline")
+    parser.add_argument('--compare', default=None, metavar='PATH',
+                        help="Check the results against a saved baseline; exit 1 on a regression")
+    parser.add_argument('--time-tolerance', type=float, default=None)
+    parser.add_argument('--memory-tolerance', type=float, default=None)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+
+    def report(name: str, result: Dict[str, Any]) -> None:
+        print(f"{name}: {result['time']:.4f} s, peak {result['peak_memory'] / 1024:.0f} KiB, "
+              f"fill {result['fill']:.2%}")
+
+    current = run_suite(args.solver, args.repeats, args.seed, report)
+    if args.save is not None:
+        with open(args.save, 'w') as f:
+            json.dump(current, f, indent=2)
+
+    if args.compare is not None:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        problems = compare(baseline, current, args.time_tolerance, args.memory_tolerance)
+        for problem in problems:
+            print(f"REGRESSION {problem}", file=sys.stderr)
+        if problems:
+            return 1
+        print(f"No regressions against {args.compare}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
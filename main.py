@@ -1,8 +1,22 @@
-from allocator.gui import BlockAllocatorGUI
+from multiprocessing import freeze_support
+import sys
 
 def main() -> None:
+    # 'serve' starts the local allocation service
+    if len(sys.argv) > 1 and sys.argv[1] == 'serve':
+        from allocator.service import main as serve_main
+        sys.exit(serve_main(sys.argv[2:]))
+
+    # Any other arguments select the headless batch mode; none opens the GUI
+    if len(sys.argv) > 1:
+        from allocator.cli import main as cli_main
+        sys.exit(cli_main(sys.argv[1:]))
+
+    from allocator.gui import BlockAllocatorGUI
     app = BlockAllocatorGUI()
     app.mainloop()
 
 if __name__ == '__main__':
+    # Needed for the solver process pool in the frozen (PyInstaller) build
+    freeze_support()
     main()
\ No newline at end of file
@@ -0,0 +1,28 @@
+import random
+
+from allocator.incremental import Replanner, plan_changes, replan
+from allocator.logic import assign_containers
+
+
+def total(plan):
+    return sum(info['total_weight'] for info in plan.values())
+
+
+def test_added_blocks_top_up_like_replan():
+    rng = random.Random(0)
+    for _ in range(40):
+        blocks = [(i, round(rng.uniform(1, 12), 1)) for i in range(rng.randint(20, 100))]
+        capacity, count = rng.choice([(26, rng.randint(1, 8)), ([20, 26, 28.5], 3)])
+        max_blocks = rng.choice([None, 3, 5])
+        plan = assign_containers(blocks, capacity, count, max_blocks)
+        new = [(1000 + i, round(rng.uniform(0.5, 12), rng.choice([1, 2]))) for i in range(rng.randint(1, 3))]
+
+        planner = Replanner(blocks, plan, capacity, count, max_blocks)
+        updated = planner.add_blocks(new)
+        assert abs(total(updated) - total(replan(blocks + new, plan, capacity, count, max_blocks))) < 1e-6
+        # Staged blocks stay where they are
+        assert all(before is None for before, _ in plan_changes(plan, updated).values())
+        for cid, info in updated.items():
+            limit = capacity[cid - 1] if isinstance(capacity, list) else capacity
+            assert info['total_weight'] <= limit + 1e-9
+            assert max_blocks is None or len(info['rows']) <= max_blocks
@@ -0,0 +1,50 @@
+import itertools
+import random
+
+from allocator.logic import assign_containers
+from allocator.multi import assign_containers_global
+
+
+def brute_force(weights, capacity, count, max_blocks):
+    """Heaviest total load over every way of putting each block in a container or leaving it out."""
+    best = 0
+    for placement in itertools.product(range(count + 1), repeat=len(weights)):
+        loads = [0] * count
+        counts = [0] * count
+        for w, c in zip(weights, placement):
+            if c < count:
+                loads[c] += w
+                counts[c] += 1
+        if all(load <= capacity for load in loads) and (max_blocks is None or max(counts) <= max_blocks):
+            best = max(best, sum(loads))
+    return best
+
+
+def test_equal_load_subsets_are_all_searched():
+    weights = [27, 13, 21, 36, 4, 28, 10]
+    assignments = assign_containers_global(list(enumerate(weights)), 61, 2)
+    assert sum(info['total_weight'] for info in assignments.values()) == 118
+    assert all(info['optimal'] for info in assignments.values())
+
+
+def test_matches_brute_force_on_small_instances():
+    rng = random.Random(1)
+    for _ in range(300):
+        weights = [rng.randint(1, 40) for _ in range(rng.randint(1, 7))]
+        capacity = rng.randint(10, 70)
+        count = rng.randint(1, 3)
+        max_blocks = rng.choice([None, None, 2, 3])
+        assignments = assign_containers_global(list(enumerate(weights)), capacity, count, max_blocks)
+        total = sum(info['total_weight'] for info in assignments.values())
+        assert total == brute_force(weights, capacity, count, max_blocks), (weights, capacity, count, max_blocks)
+        assert all(info['optimal'] for info in assignments.values())
+
+
+def test_never_worse_than_sequential():
+    rng = random.Random(2)
+    for _ in range(5):
+        blocks = [(i, round(rng.uniform(10, 25), 1)) for i in range(60)]
+        sequential = assign_containers(blocks, 26, 12)
+        assignments = assign_containers_global(blocks, 26, 12, time_budget=0.2)
+        assert (sum(info['total_weight'] for info in assignments.values())
+                >= sum(info['total_weight'] for info in sequential.values()) - 1e-9)
@@ -0,0 +1,84 @@
+import json
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+from allocator import service
+from allocator.service import AllocationService, make_server
+
+
+@pytest.fixture(scope='module')
+def url():
+    """A one-worker service with no queue, served on a free local port."""
+    with AllocationService(workers=1, queue_size=0) as allocator:
+        allocator.warm()
+        server = make_server(allocator, port=0)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            yield f"http://127.0.0.1:{server.server_address[1]}", allocator
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+def post(url, body):
+    data = body if isinstance(body, bytes) else json.dumps(body).encode()
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url + '/allocate', data=data)) as response:
+            return response.status, json.load(response)
+    except urllib.error.HTTPError as e:
+        return e.code, json.load(e)
+
+
+def slow_request(deadline):
+    """A global-strategy request that cannot be proven optimal, so it runs until its deadline."""
+    rng = random.Random(0)
+    blocks = [[i, round(rng.uniform(10.4, 24.2), 1)] for i in range(100)]
+    return {'blocks': blocks, 'capacity': 26, 'count': 20, 'strategy': 'global', 'deadline': deadline}
+
+
+def test_allocates(url):
+    status, plan = post(url[0], {'blocks': [[1, 10.5], [2, 12.25], ['A7', 13.0]], 'capacity': 26, 'count': 1})
+    assert status == 200
+    assert plan['total_weight'] == 25.25 and plan['unassigned'] == [1]
+
+
+@pytest.mark.parametrize('body', [
+    b'{not json',
+    {'blocks': [[1, 10.5]], 'capacity': 26},
+    {'blocks': [[1, 10.5]], 'capacity': 26, 'count': 1, 'max_blocks': 'x'},
+    {'blocks': [[1, 10.5]], 'capacity': 26, 'count': 1, 'precision': -1},
+    {'blocks': [[1, 10.5]], 'capacity': 26, 'count': 1, 'volume': 'big'},
+    {'blocks': [[1, -2]], 'capacity': 26, 'count': 1},
+])
+def test_bad_requests_get_400(url, body):
+    status, reply = post(url[0], body)
+    assert status == 400 and reply['error']
+
+
+def test_full_queue_gets_503(url):
+    address, allocator = url
+    replies = []
+    first = threading.Thread(target=lambda: replies.append(post(address, slow_request(1.0))))
+    first.start()
+    while allocator.pending == 0:
+        time.sleep(0.01)
+    status, reply = post(address, {'blocks': [[1, 10.5]], 'capacity': 26, 'count': 1})
+    first.join()
+    assert status == 503 and 'busy' in reply['error']
+    assert replies[0][0] == 200
+
+
+def test_late_answer_gets_504(url, monkeypatch):
+    # Give up before the deadline, while the worker is still searching
+    monkeypatch.setattr(service.SERVICE_settings, 'DEADLINE_GRACE', -0.5)
+    status, reply = post(url[0], slow_request(1.0))
+    assert status == 504 and 'deadline' in reply['error']
+    # The slot stays taken until the worker is done
+    while url[1].pending:
+        time.sleep(0.01)
@@ -0,0 +1,25 @@
+import random
+
+from allocator.logic import SharedDP, select_best_subset, _scale_weights
+
+
+def test_refold_after_remove_matches_fresh_solves():
+    rng = random.Random(0)
+    for _ in range(30):
+        # Repeated weights give groups with several binary pieces and several checkpoints
+        blocks = [(i, rng.choice([2.5, 3.0, 4.2, 5.5, 7.1, 8.0, 9.9])) for i in range(rng.randint(10, 60))]
+        capacities = [rng.choice([20, 26, 28.5]) for _ in range(4)]
+        max_blocks = rng.choice([3, 5, 8])
+        scaled, capacity_scaled = _scale_weights(blocks, max(capacities), None)
+        table = SharedDP(scaled, capacity_scaled, max_blocks)
+
+        pool = list(range(len(blocks)))
+        for capacity in capacities:
+            rows = table.select(_scale_weights(blocks, capacity, None)[1])
+            assert set(rows) <= set(pool)
+            positions, optimal = select_best_subset([blocks[i] for i in pool], capacity, max_blocks)
+            assert optimal
+            assert abs(sum(blocks[i][1] for i in rows) - sum(blocks[pool[p]][1] for p in positions)) < 1e-9
+            assert len(rows) <= max_blocks
+            assert table.remove(rows)
+            pool = [i for i in pool if i not in set(rows)]
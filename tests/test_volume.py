@@ -0,0 +1,52 @@
+import itertools
+import random
+
+import numpy as np
+import pytest
+
+from allocator.blocks import BlockSet
+from allocator.logic import load_blocks, select_best_subset, _volume_select
+
+
+def brute_force(weights, volumes, capacity, volume_limit, max_blocks):
+    """Heaviest total weight of any subset within both limits and the block count."""
+    best = 0
+    for k in range(min(max_blocks, len(weights)) + 1):
+        for subset in itertools.combinations(range(len(weights)), k):
+            if sum(weights[i] for i in subset) <= capacity and sum(volumes[i] for i in subset) <= volume_limit:
+                best = max(best, sum(weights[i] for i in subset))
+    return best
+
+
+def test_matches_brute_force():
+    rng = random.Random(0)
+    for _ in range(300):
+        n = rng.randint(1, 9)
+        weights = [rng.randint(1, 15) for _ in range(n)]
+        volumes = [round(rng.uniform(0.5, 10), 2) for _ in range(n)]
+        capacity = rng.randint(5, 40)
+        volume_limit = round(rng.uniform(2, 30), 2)
+        max_blocks = rng.randint(1, n)
+        positions, complete = _volume_select(weights, np.array(volumes), capacity, volume_limit, max_blocks)
+        assert complete
+        assert len(set(positions)) == len(positions) <= max_blocks
+        assert sum(weights[i] for i in positions) <= capacity
+        assert sum(volumes[i] for i in positions) <= volume_limit + 1e-9
+        assert sum(weights[i] for i in positions) == brute_force(weights, volumes, capacity, volume_limit, max_blocks)
+
+
+def test_volume_limit_needs_every_volume():
+    blocks = BlockSet(np.arange(2), np.array([10.0, 12.25]), volume=np.array([5.0, np.nan]))
+    assert select_best_subset(blocks, 26)[0]
+    with pytest.raises(ValueError):
+        select_best_subset(blocks, 26, volume=30)
+
+
+def test_unreadable_sizes_load_as_missing(tmp_path):
+    path = tmp_path / 'blocks.csv'
+    path.write_text("BlockNo,Weight,Volume,L,H,W\n1,10,5,100,100,100\n2,12.25,n.a.,150,120,?\n")
+    blocks = load_blocks(str(path))
+    assert blocks.to_list() == [(1, 10.0), (2, 12.25)]
+    assert np.isnan(blocks.volume[1]) and np.isnan(blocks.dims[1, 2])
+    with pytest.raises(ValueError):
+        blocks.fits_within((200, 200, 200))